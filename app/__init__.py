@@ -1,33 +1,86 @@
 from flask import Flask
 from flask_login import LoginManager
+from sqlalchemy import event
 from config import Config
-from app.models import db, User
+from app.models import db
+from app.advent import advent_calendar
+from app.fragments import card_cache
+from app.live import counter_hub
+from app.metrics import metrics
+from app.profiling import query_profiler
+from app.stats import community_stats
+from app.surge import prayer_buffer
+from app.user_cache import user_cache
 
 login_manager = LoginManager()
 
+def _is_sqlite(app):
+    return app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite')
+
+def _configure_sqlite_pool(app):
+    # In-memory SQLite uses a single shared connection; pool sizing options
+    # would be rejected by its pool class
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if _is_sqlite(app) and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri):
+        options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(key, None)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def _apply_sqlite_pragmas(app):
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not _is_sqlite(app) or not pragmas:
+        return
+    
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_pragmas)
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
     # Initialize extensions
+    _configure_sqlite_pool(app)
     db.init_app(app)
+    _apply_sqlite_pragmas(app)
     login_manager.init_app(app)
+    community_stats.init_app(app)
+    prayer_buffer.init_app(app)
+    user_cache.init_app(app)
+    card_cache.init_app(app)
+    query_profiler.init_app(app)
+    metrics.init_app(app)
+    counter_hub.init_app(app)
+    advent_calendar.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
     
     # Register blueprints
-    from app.routes import auth, main, prayers, admin
+    from app.routes import auth, main, prayers, admin, api
     app.register_blueprint(auth.bp)
     app.register_blueprint(main.bp)
     app.register_blueprint(prayers.bp)
     app.register_blueprint(admin.bp)
+    app.register_blueprint(api.bp)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
+    
+    # Create missing tables and apply pending schema migrations
+    if app.config['AUTO_MIGRATE']:
+        from app.migrations import upgrade
+        with app.app_context():
+            upgrade()
     
     return app
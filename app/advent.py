@@ -0,0 +1,81 @@
+"""
+In-memory Advent calendar
+
+The 25 Advent reflections never change once seeded, so each worker loads
+them on first use into an immutable tuple and serves the calendar from
+memory, re-reading them at most every ADVENT_RELOAD_SECONDS to pick up
+re-seeded reflections. The rendered page for anonymous visitors is cached
+per day as well, so December traffic to /advent almost never touches the
+database. reload() (the admin dashboard's Reload Advent action) forces a
+re-read in the worker that handles it.
+"""
+
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from app.cache import TTLCache
+from app.models import AdventReflection
+
+Reflection = namedtuple('Reflection', 'day scripture reflection prompt')
+
+class AdventCalendar:
+    def __init__(self, ttl=300):
+        self._reflections = None
+        self._version = None
+        self._loaded_at = None
+        self._ttl = ttl
+        self._pages = TTLCache(maxsize=25)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._ttl = app.config['ADVENT_RELOAD_SECONDS']
+
+    def _stale(self):
+        return self._reflections is None or time.monotonic() - self._loaded_at >= self._ttl
+
+    @property
+    def reflections(self):
+        """All reflections, ordered by day."""
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    rows = AdventReflection.query.order_by(AdventReflection.day).all()
+                    reflections = tuple(Reflection(r.day, r.scripture, r.reflection, r.prompt)
+                                        for r in rows)
+                    # Nothing seeded yet: don't pin an empty calendar, look again next time
+                    if not reflections:
+                        return reflections
+                    # Unchanged content keeps its rendered pages
+                    if reflections != self._reflections:
+                        # Same content, same version in every worker
+                        self._version = hashlib.sha1(repr(reflections).encode()).hexdigest()
+                        self._reflections = reflections
+                        self._pages.invalidate()
+                    self._loaded_at = time.monotonic()
+        return self._reflections
+
+    def until(self, day):
+        """Reflections for days 1..day, in order."""
+        return tuple(r for r in self.reflections if r.day <= day)
+
+    def for_day(self, day):
+        return next((r for r in self.reflections if r.day == day), None)
+
+    @property
+    def version(self):
+        return self._version if self.reflections else None
+
+    def cached_page(self, day, render):
+        """Rendered page for `day`, rendering it with render() on a miss."""
+        if not self.reflections:
+            return render()
+        return self._pages.get_or_set(day, render)
+
+    def reload(self):
+        """Drop this worker's calendar and pages; the next request re-reads them."""
+        with self._lock:
+            self._reflections = None
+            self._pages.invalidate()
+
+advent_calendar = AdventCalendar()
@@ -0,0 +1,41 @@
+"""
+Flask CLI maintenance commands (run with `flask <command>`)
+"""
+
+import click
+
+def register_commands(app):
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Recompute prayer/encouragement counters from the real rows."""
+        from app.counters import reconcile_counters
+
+        fixed = reconcile_counters()
+        click.echo(f'Reconciled counters on {fixed} prayer request(s).')
+    
+    @app.cli.command('backfill-daily-counts')
+    def backfill_daily_counts_command():
+        """Rebuild the per-request daily prayer rollup from the Prayer rows."""
+        from app.counters import backfill_daily_counts
+
+        rows = backfill_daily_counts()
+        click.echo(f'Rebuilt {rows} daily prayer count row(s).')
+    
+    @app.cli.command('backfill-prayer-stats')
+    def backfill_prayer_stats_command():
+        """Reconcile the per-user daily prayer stats with the Prayer rows."""
+        from app.counters import backfill_prayer_stats
+
+        rows = backfill_prayer_stats()
+        click.echo(f'Reconciled {rows} prayer stats row(s).')
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Create missing tables and apply pending schema migrations."""
+        from app.migrations import upgrade
+
+        applied = upgrade()
+        if applied:
+            click.echo(f'Applied migrations: {", ".join(map(str, applied))}')
+        else:
+            click.echo('Database schema is up to date.')
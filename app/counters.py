@@ -0,0 +1,278 @@
+"""
+Maintenance of the denormalized counters stored on PrayerRequest and the
+daily prayer rollup
+"""
+
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import bindparam, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import db, PrayerRequest, Prayer, Encouragement, PrayerStats, PrayerDailyCount
+
+def _increment(request_id, column, amount=1):
+    # Single UPDATE ... SET col = col + n so concurrent writers never lose
+    # increments. updated_at is pinned so counters don't reorder the
+    # answered wall or look like edits.
+    db.session.query(PrayerRequest).filter_by(id=request_id).update({
+        column: column + amount,
+        PrayerRequest.updated_at: PrayerRequest.updated_at
+    }, synchronize_session=False)
+
+def _dialect_insert(table):
+    # INSERT that supports ON CONFLICT, or None on dialects without it
+    dialect = db.session.get_bind().dialect.name
+    insert_for = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(dialect)
+    return insert_for(table) if insert_for else None
+
+def upsert_increment_many(model, key_names, column, rows):
+    """
+    For each row dict, add row[column] to `column` on the row matching the
+    `key_names` values, creating it if needed. Runs as one executemany
+    INSERT ... ON CONFLICT DO UPDATE; `key_names` must match a unique index.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    stmt = _dialect_insert(table)
+
+    if stmt is None:
+        # No portable upsert elsewhere: increment, and insert if nothing matched
+        for row in rows:
+            keys = {name: row[name] for name in key_names}
+            updated = db.session.query(model).filter_by(**keys).update(
+                {column: getattr(model, column) + row[column]}, synchronize_session=False
+            )
+            if not updated:
+                db.session.add(model(**row))
+        return
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_names),
+        set_={column: table.c[column] + stmt.excluded[column]}
+    )
+    db.session.execute(stmt, rows)
+
+def upsert_increment(model, keys, column, amount=1):
+    """Single-row upsert_increment_many(); `keys` maps key columns to values."""
+    upsert_increment_many(model, list(keys), column, [{**keys, column: amount}])
+
+def record_prayer(request_id, amount=1):
+    """
+    Bump prayer_count and today's rollup row for a request inside the
+    current transaction.
+    """
+    _increment(request_id, PrayerRequest.prayer_count, amount)
+    # The rollup is keyed by UTC day to line up with Prayer.created_at
+    upsert_increment(PrayerDailyCount,
+                     {'request_id': request_id, 'date': datetime.utcnow().date()},
+                     'prayer_count', amount)
+
+def record_prayer_stats(user_id, amount=1):
+    """Add to the user's PrayerStats row for today with a single atomic upsert."""
+    # UTC day, like the request rollup, so the backfill agrees with it
+    upsert_increment(PrayerStats, {'user_id': user_id, 'date': datetime.utcnow().date()},
+                     'prayers_offered', amount)
+
+def add_prayer(user_id, request_id, prayer_note=None, is_private=False):
+    """
+    Insert one prayer and bump its counters in the current transaction,
+    unless the user has already prayed for the request. A concurrent
+    duplicate (a double-click landing in two workers) hits the unique index
+    and is skipped rather than raising. Returns True if the prayer was
+    recorded.
+    """
+    row = {'user_id': user_id, 'request_id': request_id, 'prayer_note': prayer_note,
+           'is_private': is_private, 'created_at': datetime.utcnow()}
+    stmt = _dialect_insert(Prayer.__table__)
+
+    if stmt is None:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(Prayer.__table__), [row])
+        except IntegrityError:
+            return False
+    else:
+        stmt = stmt.values(row).on_conflict_do_nothing(index_elements=['user_id', 'request_id']) \
+            .returning(Prayer.__table__.c.id)
+        if db.session.execute(stmt).first() is None:
+            return False
+
+    record_prayer(request_id)
+    record_prayer_stats(user_id)
+    return True
+
+def _existing_prayers(pairs, chunk_size=400):
+    existing = set()
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        existing.update(db.session.execute(
+            select(Prayer.user_id, Prayer.request_id).where(
+                tuple_(Prayer.user_id, Prayer.request_id).in_(chunk)
+            )
+        ).tuples())
+    return existing
+
+def _insert_prayers(pairs):
+    if not pairs:
+        return set()
+
+    rows = [{'user_id': user_id, 'request_id': request_id,
+             'is_private': False, 'created_at': datetime.utcnow()}
+            for user_id, request_id in pairs]
+    stmt = _dialect_insert(Prayer.__table__)
+
+    if stmt is None:
+        db.session.execute(insert(Prayer.__table__), rows)
+        return set(pairs)
+
+    # Another worker may have inserted the same prayer since we checked;
+    # the unique index turns that into a skipped row rather than an error
+    stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', 'request_id']) \
+        .returning(Prayer.__table__.c.user_id, Prayer.__table__.c.request_id)
+    return set(db.session.execute(stmt, rows).tuples())
+
+def record_prayers(pairs):
+    """
+    Insert plain prayers for many (user_id, request_id) pairs in the current
+    transaction, with one set-based check for existing prayers and one
+    executemany per counter. Pairs that were already prayed, repeat in the
+    batch or point at a missing request are skipped. Returns the set of
+    pairs actually inserted.
+    """
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return set()
+
+    request_ids = {request_id for _, request_id in pairs}
+    known_requests = set(db.session.scalars(
+        select(PrayerRequest.id).where(PrayerRequest.id.in_(request_ids))
+    ))
+    already_prayed = _existing_prayers(pairs)
+    inserted = _insert_prayers([
+        pair for pair in pairs
+        if pair[1] in known_requests and pair not in already_prayed
+    ])
+    if not inserted:
+        return inserted
+
+    per_request = Counter(request_id for _, request_id in inserted)
+    per_user = Counter(user_id for user_id, _ in inserted)
+
+    requests = PrayerRequest.__table__
+    db.session.execute(
+        update(requests).where(requests.c.id == bindparam('request_id_')).values(
+            prayer_count=requests.c.prayer_count + bindparam('amount'),
+            updated_at=requests.c.updated_at
+        ),
+        [{'request_id_': request_id, 'amount': n} for request_id, n in per_request.items()]
+    )
+    upsert_increment_many(PrayerDailyCount, ('request_id', 'date'), 'prayer_count', [
+        {'request_id': request_id, 'date': datetime.utcnow().date(), 'prayer_count': n}
+        for request_id, n in per_request.items()
+    ])
+    upsert_increment_many(PrayerStats, ('user_id', 'date'), 'prayers_offered', [
+        {'user_id': user_id, 'date': datetime.utcnow().date(), 'prayers_offered': n}
+        for user_id, n in per_user.items()
+    ])
+
+    return inserted
+
+def record_encouragement(request_id, amount=1):
+    """Bump encouragement_count for a request inside the current transaction."""
+    _increment(request_id, PrayerRequest.encouragement_count, amount)
+
+def reconcile_statement():
+    """
+    UPDATE that rewrites drifted counters from the Prayer and Encouragement
+    rows. Shared by reconcile_counters() and the schema migrations.
+    """
+    actual_prayers = select(func.count(Prayer.id)).where(
+        Prayer.request_id == PrayerRequest.id
+    ).scalar_subquery()
+    actual_encouragements = select(func.count(Encouragement.id)).where(
+        Encouragement.request_id == PrayerRequest.id
+    ).scalar_subquery()
+
+    return update(PrayerRequest).where(or_(
+        PrayerRequest.prayer_count != actual_prayers,
+        PrayerRequest.encouragement_count != actual_encouragements
+    )).values({
+        PrayerRequest.prayer_count: actual_prayers,
+        PrayerRequest.encouragement_count: actual_encouragements,
+        PrayerRequest.updated_at: PrayerRequest.updated_at
+    })
+
+def reconcile_counters():
+    """
+    Recompute the stored counters from the real rows. Only rows that have
+    drifted are rewritten. Returns the number fixed.
+    """
+    result = db.session.execute(
+        reconcile_statement(),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+def backfill_daily_counts_statements():
+    """Statements that rebuild the daily rollup from the Prayer rows."""
+    day = func.date(Prayer.created_at)
+    rollup = select(
+        Prayer.request_id,
+        day,
+        func.count(Prayer.id)
+    ).group_by(Prayer.request_id, day)
+
+    return [
+        delete(PrayerDailyCount),
+        insert(PrayerDailyCount).from_select(
+            ['request_id', 'date', 'prayer_count'], rollup
+        )
+    ]
+
+def backfill_daily_counts():
+    """Rebuild the daily rollup from scratch. Returns the number of rows."""
+    for stmt in backfill_daily_counts_statements():
+        db.session.execute(stmt)
+    db.session.commit()
+    return db.session.query(func.count(PrayerDailyCount.id)).scalar()
+
+def backfill_prayer_stats_statements():
+    """
+    Statements that reconcile the per-user daily PrayerStats with the
+    Prayer rows, by UTC day. Rows already right are left alone, drifted ones
+    are corrected in place, days with no prayers are dropped and missing
+    days are added.
+    """
+    day = func.date(Prayer.created_at)
+    actual = select(func.count(Prayer.id)).where(
+        Prayer.user_id == PrayerStats.user_id,
+        day == PrayerStats.date
+    ).scalar_subquery()
+    rollup = select(
+        Prayer.user_id.label('user_id'),
+        day.label('date'),
+        func.count(Prayer.id).label('prayers_offered')
+    ).group_by(Prayer.user_id, day).subquery()
+
+    return [
+        update(PrayerStats).where(PrayerStats.prayers_offered.is_distinct_from(actual))
+            .values(prayers_offered=actual),
+        delete(PrayerStats).where(PrayerStats.prayers_offered == 0),
+        insert(PrayerStats).from_select(
+            ['user_id', 'date', 'prayers_offered'],
+            select(rollup).where(~select(PrayerStats.id).where(
+                PrayerStats.user_id == rollup.c.user_id,
+                PrayerStats.date == rollup.c.date
+            ).exists())
+        )
+    ]
+
+def backfill_prayer_stats():
+    """Reconcile PrayerStats with the Prayer rows. Returns the number of rows changed."""
+    changed = sum(db.session.execute(stmt, execution_options={'synchronize_session': False}).rowcount
+                  for stmt in backfill_prayer_stats_statements())
+    db.session.commit()
+    return changed
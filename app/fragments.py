@@ -0,0 +1,56 @@
+"""
+Rendered-fragment cache for prayer request cards
+
+The feed, home page, search and answered pages render the same card
+markup for every viewer, and nothing in a card depends on who is
+looking. Each card is rendered once per request version and the HTML is
+reused across users until the request changes.
+"""
+
+from flask import render_template
+from markupsafe import Markup
+from app.cache import TTLCache
+
+class CardCache:
+    """
+    LRU of rendered cards, one entry per request id holding the version it
+    was rendered at and the HTML per card template. The version is
+    (updated_at, prayer_count, encouragement_count), so edits, answering
+    and counter bumps from any worker are picked up on the next render
+    even without an explicit invalidate; the routes that change a request
+    still drop its entry so this worker frees the stale markup straight
+    away.
+    """
+
+    def __init__(self, maxsize=2048):
+        self._cache = TTLCache(maxsize=maxsize)
+
+    def init_app(self, app):
+        self._cache.maxsize = app.config['CARD_CACHE_SIZE']
+        app.add_template_global(self.render, 'render_card')
+
+    @staticmethod
+    def _version(prayer_request):
+        return (prayer_request.updated_at, prayer_request.prayer_count,
+                prayer_request.encouragement_count)
+
+    def render(self, template, prayer_request):
+        version = self._version(prayer_request)
+        entry = self._cache.get(prayer_request.id)
+        if entry is None or entry[0] != version:
+            entry = (version, {})
+            self._cache.set(prayer_request.id, entry)
+
+        html = entry[1].get(template)
+        if html is None:
+            html = Markup(render_template(template, request=prayer_request))
+            entry[1][template] = html
+        return html
+
+    def invalidate(self, request_id=None):
+        self._cache.invalidate(request_id)
+
+    def __len__(self):
+        return len(self._cache)
+
+card_cache = CardCache()
@@ -0,0 +1,75 @@
+"""
+Conditional responses for the public read pages
+
+A page decorated with @conditional(stamp) gets an ETag derived from a
+cheap version stamp of the data it shows. Anonymous visitors who send
+the same ETag back get a 304 without the page's queries or template
+running, and responses carry Cache-Control: public so a front proxy can
+serve them too. Logged-in users, whose pages show per-user state, and
+responses carrying flashed messages or a new session cookie are never
+marked cacheable.
+"""
+
+import hashlib
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func, select
+from app.models import db, PrayerRequest, Prayer, Encouragement
+
+def content_version(*extra):
+    """
+    Version of everything the listing pages show: the newest request
+    edit, prayer and encouragement. Counter bumps don't touch updated_at,
+    but each one comes with a new Prayer or Encouragement row. Pages that
+    depend on more pass extra scalar subqueries; it all goes out as one
+    round trip of index lookups.
+    """
+    return tuple(db.session.execute(select(
+        select(func.max(PrayerRequest.updated_at)).scalar_subquery(),
+        select(func.max(Prayer.id)).scalar_subquery(),
+        select(func.max(Encouragement.id)).scalar_subquery(),
+        *extra
+    )).one())
+
+def shared_view():
+    """True when the page is the same for every visitor: an anonymous GET with nothing flashed."""
+    return request.method == 'GET' and not current_user.is_authenticated \
+        and not session.get('_flashes')
+
+def _etag(version):
+    return hashlib.sha1(repr((request.full_path, tuple(version))).encode()).hexdigest()
+
+def _add_cache_headers(response, etag):
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['PUBLIC_CACHE_MAX_AGE']
+    response.vary.add('Cookie')
+    return response
+
+def conditional(stamp):
+    """
+    Decorator for public GET views. `stamp` is called with the view's
+    arguments and returns the page's data version, or None to serve the
+    page without conditional handling (e.g. the object doesn't exist).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if not shared_view():
+                return view(*args, **kwargs)
+
+            version = stamp(*args, **kwargs)
+            if version is None:
+                return view(*args, **kwargs)
+
+            etag = _etag(version)
+            if request.if_none_match.contains(etag):
+                return _add_cache_headers(current_app.response_class(status=304), etag)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.modified:
+                return response
+            return _add_cache_headers(response, etag)
+        return wrapped
+    return decorator
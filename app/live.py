@@ -0,0 +1,147 @@
+"""
+Live prayer counts over Server-Sent Events
+
+Pages that show running totals (the prayer tree, Christmas Eve, a request
+page) hold an EventSource open on /live/counts. Connected clients never
+query the database themselves. Once per LIVE_TICK_SECONDS a ticker
+thread reads the counts (the per-category totals plus the requests
+someone is watching) and publishes one snapshot. Each client's stream
+compares it in memory with what that client was last sent and pushes
+only the counts that changed. A thousand viewers cost the same one
+aggregation per tick as one; with nobody connected the ticker doesn't
+query at all.
+
+Counts come from the database rather than this process's own prayers,
+so prayers recorded by other workers show up too.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from sqlalchemy import func, select
+from app.models import db, PrayerRequest
+
+class CounterHub:
+    def __init__(self):
+        self.app = None
+        self._snapshot = None
+        self._version = 0
+        self._watched = Counter()
+        self._subscribers = 0
+        self._changed = threading.Condition()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+
+    # Publishing
+
+    def _aggregate(self, request_ids):
+        categories = dict(db.session.execute(
+            select(PrayerRequest.category, func.coalesce(func.sum(PrayerRequest.prayer_count), 0))
+            .group_by(PrayerRequest.category)
+        ).all())
+        requests = dict(db.session.execute(
+            select(PrayerRequest.id, PrayerRequest.prayer_count).where(PrayerRequest.id.in_(request_ids))
+        ).all()) if request_ids else {}
+        return {'total': sum(categories.values()), 'categories': categories, 'requests': requests}
+
+    def tick(self):
+        """Read the counts once and wake every stream if any moved. Skipped while nobody listens."""
+        with self._changed:
+            if not self._subscribers:
+                return
+            request_ids = list(self._watched)
+        with self.app.app_context():
+            snapshot = self._aggregate(request_ids)
+        with self._changed:
+            if snapshot == self._snapshot:
+                return
+            self._snapshot = snapshot
+            self._version += 1
+            self._changed.notify_all()
+
+    def _run(self):
+        while True:
+            time.sleep(self.app.config['LIVE_TICK_SECONDS'])
+            try:
+                self.tick()
+            except Exception:
+                self.app.logger.exception('Live counter tick failed')
+
+    # Subscribing
+
+    def _subscribe(self, request_id):
+        with self._changed:
+            self._subscribers += 1
+            if request_id is not None:
+                self._watched[request_id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-counters', daemon=True)
+                self._thread.start()
+
+    def _unsubscribe(self, request_id):
+        with self._changed:
+            self._subscribers -= 1
+            if not self._subscribers:
+                # Don't greet the next viewer with counts from the last session
+                self._snapshot = None
+            if request_id is not None:
+                self._watched[request_id] -= 1
+                if not self._watched[request_id]:
+                    del self._watched[request_id]
+
+    def stream(self, request_id=None):
+        """
+        SSE body for one client: the current counts straight away, then
+        whatever changed after each tick, with a comment line every
+        LIVE_HEARTBEAT_SECONDS so dead connections are noticed. Runs
+        without an app or request context, holding no DB connection.
+        """
+        heartbeat = self.app.config['LIVE_HEARTBEAT_SECONDS']
+        self._subscribe(request_id)
+        try:
+            # Before the first tick the page already shows current counts
+            sent = {'total': None, 'categories': {}, 'requests': {}}
+            version = -1
+            yield f"retry: {int(self.app.config['LIVE_TICK_SECONDS'] * 1000)}\n\n"
+            written = time.monotonic()
+            while True:
+                with self._changed:
+                    self._changed.wait_for(lambda: self._version != version, timeout=heartbeat)
+                    snapshot, version = self._snapshot, self._version
+
+                delta = self._delta(sent, snapshot, request_id) if snapshot is not None else None
+                if delta:
+                    yield f'data: {json.dumps(delta, separators=(",", ":"))}\n\n'
+                elif time.monotonic() - written >= heartbeat:
+                    yield ': keepalive\n\n'
+                else:
+                    continue
+                written = time.monotonic()
+        finally:
+            self._unsubscribe(request_id)
+
+    @staticmethod
+    def _delta(sent, snapshot, request_id):
+        """Counts in `snapshot` that differ from `sent`, which is updated to match."""
+        delta = {}
+        if snapshot['total'] != sent['total']:
+            if sent['total'] is not None:
+                delta['added'] = snapshot['total'] - sent['total']
+            delta['total'] = sent['total'] = snapshot['total']
+
+        categories = {category: count for category, count in snapshot['categories'].items()
+                      if sent['categories'].get(category) != count}
+        if categories:
+            delta['categories'] = categories
+            sent['categories'].update(categories)
+
+        count = snapshot['requests'].get(request_id)
+        if request_id is not None and count is not None and sent['requests'].get(request_id) != count:
+            delta['requests'] = {str(request_id): count}
+            sent['requests'][request_id] = count
+        return delta
+
+counter_hub = CounterHub()
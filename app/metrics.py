@@ -0,0 +1,259 @@
+"""
+Prometheus metrics at /metrics, shared across gunicorn workers
+
+Each worker process keeps its counters, histograms and gauges in memory
+and writes a snapshot to its own JSON file in METRICS_DIR at most every
+METRICS_FLUSH_INTERVAL seconds (and on exit). Files are named by pid plus
+a per-process token, so a new worker that reuses an old pid never
+overwrites its predecessor's numbers. /metrics, answered by whichever
+worker gets the scrape, adds up every file in the directory in the
+Prometheus text format. Counters from workers that have exited stay in
+the sum so totals never go backwards; gauges only count live workers.
+Give each deploy its own METRICS_DIR, or clear it when the service (not a
+single worker) restarts. Without METRICS_DIR nothing is written and each
+process reports only its own numbers.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from flask import Response, g, request
+from app.models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTERS = {
+    'http_requests_total': 'HTTP requests handled, by endpoint, method and status.',
+    'prayers_offered_total': 'Prayers offered (one per user per request).',
+    'prayer_requests_created_total': 'Prayer requests submitted.',
+    'encouragements_total': 'Encouragements shared.',
+    'reports_total': 'Reports filed against prayer requests.',
+    'reports_resolved_total': 'Reports resolved by moderators, by action.',
+}
+HISTOGRAMS = {
+    'http_request_duration_seconds': 'Time spent handling HTTP requests, by blueprint and endpoint.',
+}
+GAUGES = {
+    'http_requests_in_flight': 'HTTP requests being handled right now.',
+    'db_pool_size': 'Connections the database pool keeps open.',
+    'db_pool_checked_out': 'Pooled database connections in use.',
+    'db_pool_overflow': 'Connections open beyond the pool size.',
+}
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())])
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class Metrics:
+    def __init__(self):
+        self.app = None
+        self.prefix = 'praynoel_'
+        self._flushed = 0.0
+        self._registered_exit = False
+        self.directory = None
+        self._new_process()
+        os.register_at_fork(after_in_child=self._new_process)
+
+    def _new_process(self):
+        # Every process starts from zero under a fresh token: a forked worker
+        # must not re-report its parent's numbers, and one that reuses a dead
+        # worker's pid must not overwrite that worker's file
+        self._counters = {}
+        self._histograms = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._process = {'pid': os.getpid(), 'token': uuid.uuid4().hex, 'started': time.time()}
+
+    def init_app(self, app):
+        self.app = app
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        self.directory = app.config['METRICS_DIR']
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._start)
+        app.after_request(self._record_status)
+        app.teardown_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self.render_response)
+        if not self._registered_exit:
+            atexit.register(self.flush)
+            self._registered_exit = True
+
+    # Recording
+
+    def inc(self, name, amount=1, **labels):
+        if not amount:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            buckets = self._histograms.get(key)
+            if buckets is None:
+                # One count per bucket, then +Inf, sum
+                buckets = self._histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            buckets[-2] += 1
+            buckets[-1] += value
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        with self._lock:
+            self._in_flight += 1
+
+    def _record_status(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        with self._lock:
+            self._in_flight -= 1
+
+        endpoint = request.endpoint or 'unmatched'
+        status = 500 if exc is not None else g.pop('metrics_status', 500)
+        self.inc('http_requests_total', endpoint=endpoint, method=request.method, status=status)
+        self.observe('http_request_duration_seconds', time.perf_counter() - started,
+                     blueprint=request.blueprint or '', endpoint=endpoint)
+
+        if time.monotonic() - self._flushed >= self.app.config['METRICS_FLUSH_INTERVAL']:
+            self.flush()
+
+    # Sharing between workers
+
+    def _pool_gauges(self):
+        pool = db.engine.pool
+        gauges = {}
+        for name, method in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checkedout'),
+                             ('db_pool_overflow', 'overflow')):
+            # Only QueuePool reports all three; SQLite's in-memory pools report none
+            if callable(getattr(pool, method, None)):
+                # QueuePool.overflow() counts up from -pool_size
+                gauges[_key(name, {})] = max(0, getattr(pool, method)())
+        return gauges
+
+    def _snapshot(self):
+        with self._lock:
+            snapshot = dict(self._process, **{
+                'counters': dict(self._counters),
+                'histograms': {key: list(values) for key, values in self._histograms.items()},
+                'gauges': {_key('http_requests_in_flight', {}): self._in_flight},
+            })
+            self._flushed = time.monotonic()
+        if self.app is not None:
+            try:
+                with self.app.app_context():
+                    snapshot['gauges'].update(self._pool_gauges())
+            except Exception:
+                pass
+        return snapshot
+
+    def flush(self):
+        """Write this process's snapshot where the other workers can read it."""
+        if self.directory is None:
+            return
+        snapshot = self._snapshot()
+        path = os.path.join(self.directory, f"{snapshot['pid']}-{snapshot['token']}.json")
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temporary, path)
+
+    def _snapshots(self):
+        if self.directory is None:
+            return [self._snapshot()]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def collect(self):
+        """Counters, histograms and gauges summed over every worker's snapshot."""
+        snapshots = self._snapshots()
+        # Of several snapshots under one pid only the newest process can be alive
+        newest = {}
+        for snapshot in snapshots:
+            if snapshot.get('started', 0) >= newest.get(snapshot['pid'], 0):
+                newest[snapshot['pid']] = snapshot.get('started', 0)
+
+        counters, histograms, gauges = {}, {}, {}
+        for snapshot in snapshots:
+            for key, value in snapshot['counters'].items():
+                counters[key] = counters.get(key, 0) + value
+            for key, values in snapshot['histograms'].items():
+                total = histograms.setdefault(key, [0] * len(values))
+                histograms[key] = [a + b for a, b in zip(total, values)]
+            if snapshot.get('started', 0) == newest[snapshot['pid']] and _pid_alive(snapshot['pid']):
+                for key, value in snapshot['gauges'].items():
+                    gauges[key] = gauges.get(key, 0) + value
+        return counters, histograms, gauges
+
+    # Exposition
+
+    def render(self):
+        counters, histograms, gauges = self.collect()
+        lines = []
+
+        def family(kind, helps, samples, write):
+            for name, help_text in helps.items():
+                metric = self.prefix + name
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} {kind}')
+                for key in sorted(samples):
+                    sample_name, labels = json.loads(key)
+                    if sample_name == name:
+                        write(metric, labels, samples[key])
+
+        def counter(metric, labels, value):
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+
+        def histogram(metric, labels, values):
+            for bound, count in zip(LATENCY_BUCKETS, values):
+                lines.append(f'{metric}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{metric}_bucket{_format_labels(labels, [("le", "+Inf")])} {values[-2]}')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {values[-1]}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {values[-2]}')
+
+        family('counter', COUNTERS, counters, counter)
+        family('histogram', HISTOGRAMS, histograms, histogram)
+        family('gauge', GAUGES, gauges, counter)
+        return '\n'.join(lines) + '\n'
+
+    def render_response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+metrics = Metrics()
@@ -0,0 +1,127 @@
+"""
+Lightweight schema migrations
+
+db.create_all() only creates tables that are missing; it never adds
+columns or indexes to tables that already exist. Each migration below
+brings an existing SQLite or PostgreSQL database forward in place (plain
+ALTER TABLE ADD COLUMN / CREATE INDEX, no table rebuilds) and is written
+to be a no-op against a freshly created schema. Applied versions are
+recorded in the schema_version table.
+"""
+
+from datetime import datetime
+from sqlalchemy import inspect, select, text
+from app.models import db, PrayerRequest, Prayer, Encouragement, Report, PrayerStats
+from app.counters import reconcile_statement, backfill_daily_counts_statements, backfill_prayer_stats_statements
+from app.search import create_search_index
+
+schema_version = db.Table(
+    'schema_version',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(200), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+def _add_column(conn, model, column_name):
+    table = model.__table__
+    existing = {col['name'] for col in inspect(conn).get_columns(table.name)}
+    if column_name in existing:
+        return
+
+    column = table.c[column_name]
+    ddl = f'ALTER TABLE {_quote(conn, table.name)} ADD COLUMN ' \
+          f'{_quote(conn, column.name)} {column.type.compile(dialect=conn.dialect)}'
+    if column.default is not None and column.default.is_scalar:
+        ddl += f' DEFAULT {column.default.arg!r}'
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    conn.execute(text(ddl))
+
+def _create_indexes(conn, *models):
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+# Migrations
+
+def _add_request_counters(conn):
+    _add_column(conn, PrayerRequest, 'prayer_count')
+    _add_column(conn, PrayerRequest, 'encouragement_count')
+    conn.execute(reconcile_statement())
+
+def _add_hot_path_indexes(conn):
+    # Collapse duplicates left behind by concurrent double-clicks so the
+    # unique indexes can be built
+    conn.execute(text(
+        'DELETE FROM prayer WHERE id NOT IN ('
+        'SELECT MIN(id) FROM prayer GROUP BY user_id, request_id)'
+    ))
+    conn.execute(text(
+        'UPDATE prayer_stats SET prayers_offered = ('
+        'SELECT SUM(s.prayers_offered) FROM prayer_stats s '
+        'WHERE s.user_id = prayer_stats.user_id AND s.date = prayer_stats.date) '
+        'WHERE id IN (SELECT MIN(id) FROM prayer_stats GROUP BY user_id, date HAVING COUNT(*) > 1)'
+    ))
+    conn.execute(text(
+        'DELETE FROM prayer_stats WHERE id NOT IN ('
+        'SELECT MIN(id) FROM prayer_stats GROUP BY user_id, date)'
+    ))
+    conn.execute(reconcile_statement())
+
+    _create_indexes(conn, PrayerRequest, Prayer, Encouragement, Report, PrayerStats)
+
+def _add_most_prayed_indexes(conn):
+    _create_indexes(conn, PrayerRequest)
+
+def _backfill_daily_counts(conn):
+    for stmt in backfill_daily_counts_statements():
+        conn.execute(stmt)
+
+def _add_full_text_search(conn):
+    create_search_index(conn)
+
+def _add_updated_at_index(conn):
+    _create_indexes(conn, PrayerRequest)
+
+def _backfill_prayer_stats(conn):
+    for stmt in backfill_prayer_stats_statements():
+        conn.execute(stmt)
+
+MIGRATIONS = [
+    (1, 'Stored prayer/encouragement counters on prayer_request', _add_request_counters),
+    (2, 'Hot-path indexes and one-prayer-per-user uniqueness', _add_hot_path_indexes),
+    (3, 'Most-prayed feed indexes on the stored prayer counter', _add_most_prayed_indexes),
+    (4, 'Backfill the per-request daily prayer rollup', _backfill_daily_counts),
+    (5, 'Full-text search index over prayer requests', _add_full_text_search),
+    (6, 'Index on prayer_request.updated_at for conditional responses', _add_updated_at_index),
+    (7, 'Reconcile per-user prayer stats with the prayer rows', _backfill_prayer_stats),
+]
+
+def upgrade():
+    """
+    Create any missing tables, then apply pending migrations in order, each
+    in its own transaction. Returns the list of versions applied.
+    """
+    db.create_all()
+
+    applied = set(db.session.execute(select(schema_version.c.version)).scalars())
+    db.session.commit()
+
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+
+        with db.engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_version.insert().values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+        newly_applied.append(version)
+
+    return newly_applied
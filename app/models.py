@@ -1,10 +1,15 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm import joinedload
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+def fits_bigint(value):
+    """True if the integer `value` can be bound as a database integer (signed 64-bit)."""
+    return -2**63 <= value < 2**63
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -25,6 +30,23 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
 class PrayerRequest(db.Model):
+    __table_args__ = (
+        # Feed: public, non-private requests (optionally by category), newest first
+        db.Index('ix_prayer_request_feed', 'is_public', 'is_private', 'created_at'),
+        db.Index('ix_prayer_request_feed_category', 'is_public', 'is_private', 'category', 'created_at'),
+        # Feed sorted by the stored prayer counter ("most prayed")
+        db.Index('ix_prayer_request_most_prayed', 'is_public', 'is_private', 'prayer_count', 'id'),
+        db.Index('ix_prayer_request_most_prayed_category', 'is_public', 'is_private', 'category', 'prayer_count', 'id'),
+        # Answered wall, newest testimony first
+        db.Index('ix_prayer_request_answered', 'is_answered', 'is_public', 'updated_at'),
+        # My requests
+        db.Index('ix_prayer_request_user', 'user_id', 'created_at'),
+        # Admin lists sort everything by created_at
+        db.Index('ix_prayer_request_created_at', 'created_at'),
+        # Latest change anywhere, for the public pages' ETags
+        db.Index('ix_prayer_request_updated_at', 'updated_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -40,14 +62,23 @@ class PrayerRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Denormalized counters, maintained by app.counters
+    prayer_count = db.Column(db.Integer, default=0, nullable=False)
+    encouragement_count = db.Column(db.Integer, default=0, nullable=False)
+    
     # Relationships
     prayers = db.relationship('Prayer', backref='request', lazy=True, cascade='all, delete-orphan')
     encouragements = db.relationship('Encouragement', backref='request', lazy=True, cascade='all, delete-orphan')
     reports = db.relationship('Report', backref='request', lazy=True, cascade='all, delete-orphan')
     
-    @property
-    def prayer_count(self):
-        return len(self.prayers)
+    @classmethod
+    def card_query(cls):
+        """
+        Base query for pages that render request cards. The author is
+        joined in up front and counts come from the stored counter columns,
+        so a page of cards costs a single SELECT.
+        """
+        return cls.query.options(joinedload(cls.author))
     
     @property
     def display_name(self):
@@ -56,6 +87,15 @@ class PrayerRequest(db.Model):
         return self.author.username
 
 class Prayer(db.Model):
+    __table_args__ = (
+        # One prayer per user per request. Declared as a unique index rather
+        # than a constraint so it can be added to an existing SQLite table.
+        db.Index('uq_prayer_user_request', 'user_id', 'request_id', unique=True),
+        db.Index('ix_prayer_request_created', 'request_id', 'created_at'),
+        db.Index('ix_prayer_user_created', 'user_id', 'created_at'),
+        db.Index('ix_prayer_created_at', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     request_id = db.Column(db.Integer, db.ForeignKey('prayer_request.id'), nullable=False)
@@ -64,6 +104,10 @@ class Prayer(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Encouragement(db.Model):
+    __table_args__ = (
+        db.Index('ix_encouragement_request_created', 'request_id', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     request_id = db.Column(db.Integer, db.ForeignKey('prayer_request.id'), nullable=False)
@@ -72,6 +116,11 @@ class Encouragement(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Report(db.Model):
+    __table_args__ = (
+        db.Index('ix_report_status_created', 'status', 'created_at'),
+        db.Index('ix_report_request', 'request_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     request_id = db.Column(db.Integer, db.ForeignKey('prayer_request.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -127,9 +176,58 @@ class DailyFeaturedPrayer(db.Model):
     prayer_request = db.relationship('PrayerRequest', backref='featured_dates')
 
 class PrayerStats(db.Model):
+    __table_args__ = (
+        db.Index('uq_prayer_stats_user_date', 'user_id', 'date', unique=True),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
     prayers_offered = db.Column(db.Integer, default=0)
     
     user = db.relationship('User', backref='prayer_stats')
+
+class PrayerDailyCount(db.Model):
+    # Prayers offered per request per (UTC) day, rolled up as prayers come in
+    __table_args__ = (
+        db.Index('uq_prayer_daily_count_request_date', 'request_id', 'date', unique=True),
+        db.Index('ix_prayer_daily_count_date', 'date', 'prayer_count'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    request_id = db.Column(db.Integer, db.ForeignKey('prayer_request.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    prayer_count = db.Column(db.Integer, default=0, nullable=False)
+    
+    prayer_request = db.relationship('PrayerRequest', backref=db.backref('daily_counts', cascade='all, delete-orphan'))
+    
+    @classmethod
+    def window(cls, start, end=None):
+        """Subquery of (request_id, prayer_count) summed over start..end inclusive."""
+        query = db.session.query(
+            cls.request_id,
+            db.func.sum(cls.prayer_count).label('prayer_count')
+        ).filter(cls.date >= start)
+        if end is not None:
+            query = query.filter(cls.date <= end)
+        return query.group_by(cls.request_id).subquery()
+    
+    @classmethod
+    def leaderboard(cls, start, end, limit=5):
+        """Public (PrayerRequest, prayers) pairs ranked by prayers offered start..end."""
+        if end == start:
+            # Single day: read straight off the (date, prayer_count) index
+            prayers = cls.prayer_count
+            query = db.session.query(PrayerRequest, prayers).join(
+                cls, PrayerRequest.id == cls.request_id
+            ).filter(cls.date == start)
+        else:
+            counts = cls.window(start, end)
+            prayers = counts.c.prayer_count
+            query = db.session.query(PrayerRequest, prayers).join(
+                counts, PrayerRequest.id == counts.c.request_id
+            )
+        
+        return query.filter(PrayerRequest.is_public == True).order_by(
+            prayers.desc()
+        ).limit(limit).all()
@@ -0,0 +1,125 @@
+"""
+Keyset (cursor) pagination
+
+Instead of OFFSET/COUNT, each page remembers the sort key of its first
+and last row in an opaque cursor and the next query seeks past it using
+the index. Cost per page stays flat however deep the reader scrolls.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.cache import TTLCache
+from app.models import fits_bigint
+
+# Totals shown next to the pager are approximate, refreshed once a minute
+_count_cache = TTLCache(maxsize=256, ttl=60)
+
+def encode_cursor(direction, values):
+    payload = [direction] + [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token, columns):
+    """Return (direction, values) or None if the token is missing or invalid."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, *values = json.loads(raw)
+        if direction not in ('next', 'prev') or len(values) != len(columns):
+            return None
+        values = [_coerce(col, value) for col, value in zip(columns, values)]
+    except (ValueError, TypeError, OverflowError, binascii.Error):
+        return None
+    # An integer the database can't bind would fail the query, not just miss
+    if any(isinstance(value, int) and not fits_bigint(value) for value in values):
+        return None
+    return direction, values
+
+def _coerce(column, value):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+def _beyond(columns, values, compare):
+    # Row-value comparison spelled out so it works on every dialect:
+    # (a, b) < (x, y)  ==  a < x OR (a = x AND b < y)
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal, compare(column, values[i])))
+    return or_(*clauses)
+
+def cached_count(key, query):
+    """Approximate total for a filtered query, cached for a minute."""
+    return _count_cache.get_or_set(key, lambda: query.order_by(None).count())
+
+class KeysetPagination:
+    def __init__(self, items, next_cursor, prev_cursor, total):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, count_key=None):
+    """
+    Paginate `query` in descending order of `columns` (the last column must
+    be unique, normally the primary key). `cursor` is a token previously
+    returned as next_cursor/prev_cursor. Pass `count_key` to include an
+    approximate, cached total.
+    """
+    total = cached_count(count_key, query) if count_key is not None else None
+    decoded = decode_cursor(cursor, columns)
+
+    # Select the sort key next to each entity so cursors can be built from
+    # computed keys (e.g. counts from a joined subquery) as well as columns
+    query = query.add_columns(*columns)
+
+    if decoded is None:
+        direction = 'next'
+        rows = query.order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+    elif decoded[0] == 'next':
+        direction = 'next'
+        rows = query.filter(_beyond(columns, decoded[1], lambda c, v: c < v)) \
+            .order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+    else:
+        # Walk backwards in ascending order, then flip the page around
+        direction = 'prev'
+        rows = query.filter(_beyond(columns, decoded[1], lambda c, v: c > v)) \
+            .order_by(*[c.asc() for c in columns]).limit(per_page + 1).all()
+
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    if not rows:
+        return KeysetPagination(items, None, None, total)
+
+    if direction == 'next':
+        has_next, has_prev = more, decoded is not None
+    else:
+        has_next, has_prev = True, more
+
+    return KeysetPagination(
+        items,
+        encode_cursor('next', rows[-1][1:]) if has_next else None,
+        encode_cursor('prev', rows[0][1:]) if has_prev else None,
+        total
+    )
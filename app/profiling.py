@@ -0,0 +1,162 @@
+"""
+Opt-in SQL profiling per request
+
+With SQL_PROFILING on, engine events time every statement run while a
+request is being handled. At the end of the request the profile (statement
+count, total DB time, the slowest statements and any N+1 patterns, i.e.
+one statement shape repeated more than SQL_N_PLUS_ONE_THRESHOLD times)
+goes to a structured log line and debug response headers, and is folded
+into rolling per-endpoint aggregates shown at /admin/perf. Aggregates are
+kept per worker process.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from app.models import db
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*[?%][^,)]*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+def normalize_sql(statement):
+    """Statement shape: literals become ?, IN lists collapse, whitespace folds."""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (...)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.statements = []
+
+    def record(self, statement, duration):
+        shape = normalize_sql(statement)
+        self.count += 1
+        self.db_time += duration
+        self.shapes[shape] += 1
+        self.statements.append((duration, shape))
+
+    def slowest(self, limit):
+        return sorted(self.statements, reverse=True)[:limit]
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+class EndpointStats:
+    def __init__(self, window):
+        self.requests = 0
+        self.statements = 0
+        self.db_time = 0.0
+        self.n_plus_one = 0
+        self.recent = deque(maxlen=window)
+        self.slowest = []
+
+    def add(self, profile, total, slowest, repeated, keep):
+        self.requests += 1
+        self.statements += profile.count
+        self.db_time += profile.db_time
+        self.n_plus_one += bool(repeated)
+        self.recent.append((total, profile.db_time, profile.count))
+        self.slowest = sorted(self.slowest + slowest, reverse=True)[:keep]
+
+    def summary(self):
+        totals = sorted(r[0] for r in self.recent)
+        db_times = sorted(r[1] for r in self.recent)
+        p95 = lambda values: values[min(len(values) - 1, int(len(values) * 0.95))] if values else 0
+        return {
+            'requests': self.requests,
+            'avg_statements': self.statements / self.requests,
+            'avg_db_ms': self.db_time / self.requests * 1000,
+            'p95_ms': p95(totals) * 1000,
+            'p95_db_ms': p95(db_times) * 1000,
+            'max_statements': max((r[2] for r in self.recent), default=0),
+            'n_plus_one': self.n_plus_one,
+            'slowest': [(duration * 1000, shape) for duration, shape in self.slowest],
+        }
+
+class QueryProfiler:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['SQL_PROFILING']
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        if has_request_context() and 'sql_profile' in g:
+            g.sql_profile.record(statement, time.perf_counter() - started)
+
+    def _start(self):
+        g.sql_profile = RequestProfile()
+
+    def _finish(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None or request.endpoint in (None, 'static'):
+            return response
+
+        config = self.app.config
+        total = time.perf_counter() - profile.started
+        slowest = profile.slowest(config['SQL_PROFILING_SLOWEST'])
+        repeated = profile.repeated(config['SQL_N_PLUS_ONE_THRESHOLD'])
+
+        with self._lock:
+            stats = self._endpoints.get(request.endpoint)
+            if stats is None:
+                stats = self._endpoints[request.endpoint] = EndpointStats(config['SQL_PROFILING_WINDOW'])
+            stats.add(profile, total, slowest, repeated, config['SQL_PROFILING_SLOWEST'])
+
+        self.app.logger.info('sql_profile %s', json.dumps({
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 2),
+            'statements': profile.count,
+            'db_ms': round(profile.db_time * 1000, 2),
+            'slowest': [{'ms': round(duration * 1000, 2), 'sql': shape} for duration, shape in slowest],
+            'n_plus_one': [{'count': n, 'sql': shape} for shape, n in repeated],
+        }))
+
+        if self.app.debug:
+            response.headers['X-SQL-Count'] = str(profile.count)
+            response.headers['X-SQL-Time-Ms'] = f'{profile.db_time * 1000:.2f}'
+            if repeated:
+                response.headers['X-SQL-N-Plus-One'] = str(len(repeated))
+        return response
+
+    def snapshot(self):
+        """Per-endpoint aggregates, heaviest total DB time first."""
+        with self._lock:
+            rows = [(endpoint, stats.summary()) for endpoint, stats in self._endpoints.items()]
+        return sorted(rows, key=lambda row: row[1]['avg_db_ms'] * row[1]['requests'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+query_profiler = QueryProfiler()
@@ -1,8 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_required, current_user
 from functools import wraps
-from app.models import db, PrayerRequest, User, Report, DailyFeaturedPrayer, AdventReflection
+from app.advent import advent_calendar
+from app.models import db, PrayerRequest, Prayer, User, Report, DailyFeaturedPrayer, AdventReflection
+from app.fragments import card_cache
+from app.metrics import metrics
+from app.pagination import keyset_paginate
+from app.profiling import query_profiler
+from app.stats import community_stats
+from app.user_cache import user_cache
 from datetime import date, datetime
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -23,7 +32,7 @@ def dashboard():
     pending_reports = Report.query.filter_by(status='pending').count()
     
     # Get recent requests
-    recent_requests = PrayerRequest.query.order_by(
+    recent_requests = PrayerRequest.card_query().order_by(
         PrayerRequest.created_at.desc()
     ).limit(10).all()
     
@@ -43,11 +52,89 @@ def dashboard():
 def reports():
     status = request.args.get('status', 'pending')
     
-    reports = Report.query.filter_by(status=status).order_by(
-        Report.created_at.desc()
-    ).all()
+    # One row per reported request, most reported first
+    grouped = select(
+        Report.request_id,
+        func.count(Report.id).label('report_count')
+    ).where(Report.status == status).group_by(Report.request_id).subquery()
     
-    return render_template('admin/reports.html', reports=reports, current_status=status)
+    query = PrayerRequest.card_query().join(grouped, PrayerRequest.id == grouped.c.request_id)
+    pagination = keyset_paginate(query, (grouped.c.report_count, PrayerRequest.id),
+                                 cursor=request.args.get('cursor'),
+                                 per_page=current_app.config['ADMIN_REPORTS_PER_PAGE'])
+    
+    return render_template('admin/reports.html',
+                         requests=pagination.items,
+                         summaries=_report_summaries([r.id for r in pagination.items], status),
+                         pagination=pagination,
+                         current_status=status)
+
+def _report_summaries(request_ids, status, latest=5):
+    """
+    {request_id: (report count, latest few reports)} for one page of the
+    queue, reporters included, in a single query.
+    """
+    if not request_ids:
+        return {}
+    
+    ranked = select(
+        Report.id,
+        func.row_number().over(partition_by=Report.request_id,
+                               order_by=(Report.created_at.desc(), Report.id.desc())).label('rank'),
+        func.count(Report.id).over(partition_by=Report.request_id).label('total')
+    ).where(Report.request_id.in_(request_ids), Report.status == status).subquery()
+    
+    rows = db.session.query(Report, ranked.c.total).options(
+        joinedload(Report.reporter)
+    ).join(ranked, Report.id == ranked.c.id).filter(
+        ranked.c.rank <= latest
+    ).order_by(Report.request_id, ranked.c.rank)
+    
+    summaries = {}
+    for report, total in rows:
+        summaries.setdefault(report.request_id, (total, []))[1].append(report)
+    return summaries
+
+@bp.route('/reports/bulk', methods=['POST'])
+@login_required
+@admin_required
+def bulk_review_reports():
+    request_ids = request.form.getlist('request_ids', type=int)
+    action = request.form.get('action')
+    
+    if not request_ids or action not in ('dismiss', 'hide'):
+        flash('Select at least one request and an action.', 'error')
+        return redirect(url_for('admin.reports'))
+    
+    # Everything below commits together or not at all
+    pending = and_(Report.request_id.in_(request_ids), Report.status == 'pending')
+    if action == 'dismiss':
+        result = db.session.execute(
+            update(Report).where(pending).values(status='dismissed'),
+            execution_options={'synchronize_session': False}
+        )
+    else:
+        db.session.execute(
+            update(PrayerRequest).where(PrayerRequest.id.in_(request_ids)).values(is_public=False),
+            execution_options={'synchronize_session': False}
+        )
+        result = db.session.execute(
+            update(Report).where(pending).values(status='reviewed'),
+            execution_options={'synchronize_session': False}
+        )
+    db.session.commit()
+    metrics.inc('reports_resolved_total', result.rowcount, action=action)
+    
+    if action == 'hide':
+        community_stats.invalidate()
+        for request_id in request_ids:
+            card_cache.invalidate(request_id)
+        flash(f'{len(request_ids)} request(s) removed from public view; '
+              f'{result.rowcount} report(s) resolved.', 'success')
+    else:
+        flash(f'{result.rowcount} report(s) dismissed.', 'info')
+    
+    return redirect(url_for('admin.reports'))
 
 @bp.route('/report/<int:id>/review', methods=['POST'])
 @login_required
@@ -59,12 +146,16 @@ def review_report(id):
     if action == 'dismiss':
         report.status = 'dismissed'
         db.session.commit()
+        metrics.inc('reports_resolved_total', action='dismiss')
         flash('Report dismissed.', 'info')
     elif action == 'remove':
         # Mark request as not public
         report.request.is_public = False
         report.status = 'reviewed'
         db.session.commit()
+        metrics.inc('reports_resolved_total', action='hide')
+        community_stats.invalidate()
+        card_cache.invalidate(report.request_id)
         flash('Prayer request removed from public view.', 'success')
     
     return redirect(url_for('admin.reports'))
@@ -89,6 +180,8 @@ def toggle_public(id):
     prayer_request.is_public = not prayer_request.is_public
     
     db.session.commit()
+    community_stats.invalidate()
+    card_cache.invalidate(id)
     
     status = 'public' if prayer_request.is_public else 'hidden'
     flash(f'Request is now {status}.', 'success')
@@ -143,12 +236,62 @@ def featured_prayer():
                          featured_prayers=featured_prayers,
                          recent_requests=recent_requests)
 
+def _user_activity(user_ids):
+    """{user_id: (requests, prayers)} for one page of users, in a single query."""
+    if not user_ids:
+        return {}
+    
+    requests = select(func.count(PrayerRequest.id)).where(
+        PrayerRequest.user_id == User.id
+    ).scalar_subquery()
+    prayers = select(func.count(Prayer.id)).where(
+        Prayer.user_id == User.id
+    ).scalar_subquery()
+    
+    rows = db.session.execute(
+        select(User.id, requests, prayers).where(User.id.in_(user_ids))
+    )
+    return {user_id: (request_count, prayer_count) for user_id, request_count, prayer_count in rows}
+
+def _prefix_upper(prefix):
+    """Smallest string above everything starting with `prefix`, or None if nothing is."""
+    # Trailing U+10FFFF can't be incremented; dropping it only loosens the bound
+    prefix = prefix.rstrip('\U0010ffff')
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        # Surrogates can't be encoded, so skip past them
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
 @bp.route('/users')
 @login_required
 @admin_required
 def users():
-    users = User.query.order_by(User.created_at.desc()).all()
-    return render_template('admin/users.html', users=users)
+    q = request.args.get('q', '').strip()
+    
+    query = User.query
+    if q:
+        # Prefix match as a range, so it's served by the unique indexes on
+        # username and email (a LIKE 'q%' would scan the table)
+        upper = _prefix_upper(q)
+        query = query.filter(or_(*[
+            and_(column >= q, column < upper) if upper else column >= q
+            for column in (User.username, User.email)
+        ]))
+    
+    # Newest first; ids follow signup order, so the primary key is the sort key
+    pagination = keyset_paginate(query, (User.id,),
+                                 cursor=request.args.get('cursor'),
+                                 per_page=current_app.config['ADMIN_USERS_PER_PAGE'],
+                                 count_key=None if q else ('admin-users',))
+    
+    return render_template('admin/users.html',
+                         users=pagination.items,
+                         activity=_user_activity([user.id for user in pagination.items]),
+                         pagination=pagination,
+                         q=q)
 
 @bp.route('/user/<int:id>/toggle-admin', methods=['POST'])
 @login_required
@@ -163,8 +306,35 @@ def toggle_admin(id):
     
     user.is_admin = not user.is_admin
     db.session.commit()
+    user_cache.invalidate(user.id)
     
     status = 'granted' if user.is_admin else 'revoked'
     flash(f'Admin privileges {status} for {user.username}.', 'success')
     
     return redirect(url_for('admin.users'))
+
+@bp.route('/advent/reload', methods=['POST'])
+@login_required
+@admin_required
+def reload_advent():
+    # Other workers re-read within ADVENT_RELOAD_SECONDS
+    advent_calendar.reload()
+    flash('Advent calendar reloaded.', 'success')
+    return redirect(url_for('admin.dashboard'))
+
+@bp.route('/perf')
+@login_required
+@admin_required
+def perf():
+    return render_template('admin/perf.html',
+                         enabled=query_profiler.enabled,
+                         endpoints=query_profiler.snapshot(),
+                         threshold=current_app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+
+@bp.route('/perf/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_perf():
+    query_profiler.reset()
+    flash('Profiling aggregates cleared.', 'info')
+    return redirect(url_for('admin.perf'))
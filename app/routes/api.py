@@ -0,0 +1,180 @@
+from collections import namedtuple
+from flask import Blueprint, request, jsonify, abort, current_app
+from werkzeug.exceptions import HTTPException
+from app.models import PrayerRequest, Prayer, Encouragement, User
+from app.http_cache import conditional, content_version
+from app.pagination import keyset_paginate
+from app.routes.prayers import _feed_query, _feed_version, _request_version, _check_access
+from sqlalchemy.orm import joinedload, load_only
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# A field reads one value off a loaded row. `columns` are the attributes it
+# needs, so only the columns behind the requested fields are selected.
+Field = namedtuple('Field', 'columns get')
+
+def _timestamp(value):
+    # Stored as naive UTC
+    return value.isoformat() + 'Z' if value else None
+
+REQUEST_FIELDS = {
+    'id': Field(('id',), lambda r: r.id),
+    'title': Field(('title',), lambda r: r.title),
+    'content': Field(('content',), lambda r: r.content),
+    'category': Field(('category',), lambda r: r.category),
+    'bible_verse': Field(('bible_verse',), lambda r: r.bible_verse),
+    'author': Field(('is_anonymous', 'user_id'), lambda r: r.display_name),
+    'is_urgent': Field(('is_urgent',), lambda r: r.is_urgent),
+    'is_answered': Field(('is_answered',), lambda r: r.is_answered),
+    'testimony': Field(('testimony',), lambda r: r.testimony),
+    'prayer_count': Field(('prayer_count',), lambda r: r.prayer_count),
+    'encouragement_count': Field(('encouragement_count',), lambda r: r.encouragement_count),
+    'created_at': Field(('created_at',), lambda r: _timestamp(r.created_at)),
+    'updated_at': Field(('updated_at',), lambda r: _timestamp(r.updated_at)),
+}
+LIST_FIELDS = ('id', 'title', 'category', 'author', 'is_urgent', 'is_answered',
+               'prayer_count', 'encouragement_count', 'created_at')
+# The detail view can also embed the first page of prayers and encouragements
+DETAIL_EXTRAS = ('prayers', 'encouragements')
+
+PRAYER_FIELDS = {
+    'id': Field(('id',), lambda p: p.id),
+    'user': Field((), lambda p: p.user.username),
+    'note': Field(('prayer_note',), lambda p: p.prayer_note),
+    'created_at': Field(('created_at',), lambda p: _timestamp(p.created_at)),
+}
+ENCOURAGEMENT_FIELDS = {
+    'id': Field(('id',), lambda e: e.id),
+    'author': Field((), lambda e: e.author.username),
+    'content': Field(('content',), lambda e: e.content),
+    'bible_verse': Field(('bible_verse',), lambda e: e.bible_verse),
+    'created_at': Field(('created_at',), lambda e: _timestamp(e.created_at)),
+}
+
+@bp.errorhandler(HTTPException)
+def _error(e):
+    return jsonify(error=e.description), e.code
+
+def _selected(available, default):
+    """Fields named in ?fields=a,b,c, or `default` when none are given."""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(default)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def _only(model, fields, names):
+    """Load just the columns behind `names` (and only the joined author's username)."""
+    columns = {column for name in names if name in fields for column in fields[name].columns}
+    options = [load_only(*[getattr(model, column) for column in sorted(columns | {'id'})])]
+    if model is PrayerRequest:
+        options.append(joinedload(PrayerRequest.author).load_only(User.username))
+    return options
+
+def _serialize(items, fields, names):
+    getters = [(name, fields[name].get) for name in names if name in fields]
+    return [{name: get(item) for name, get in getters} for item in items]
+
+def _per_page():
+    limit = request.args.get('limit', current_app.config['REQUESTS_PER_PAGE'], type=int)
+    return max(1, min(limit, current_app.config['API_MAX_PER_PAGE']))
+
+def _page(query, sort_key, fields, names, count_key=None, cursor=None):
+    pagination = keyset_paginate(query, sort_key,
+                                 cursor=request.args.get('cursor') if cursor is None else cursor,
+                                 per_page=_per_page(),
+                                 count_key=count_key)
+    return {
+        'data': _serialize(pagination.items, fields, names),
+        'next_cursor': pagination.next_cursor,
+        'prev_cursor': pagination.prev_cursor,
+        'total': pagination.total,
+    }
+
+def _request_list(category, sort_by):
+    names = _selected(REQUEST_FIELDS, LIST_FIELDS)
+    query, sort_key = _feed_query(category, sort_by)
+    query = query.options(*_only(PrayerRequest, REQUEST_FIELDS, names))
+    return jsonify(_page(query, sort_key, REQUEST_FIELDS, names,
+                         count_key=('feed', category, sort_by)))
+
+@bp.route('/feed')
+@conditional(_feed_version)
+def feed():
+    return _request_list(request.args.get('category', 'all'),
+                         request.args.get('sort', 'recent'))
+
+def _most_prayed_sort():
+    period = request.args.get('period', 'all')  # all, week
+    return 'most_prayed_week' if period == 'week' else 'most_prayed'
+
+@bp.route('/most-prayed')
+@conditional(lambda: _feed_version(_most_prayed_sort()))
+def most_prayed():
+    return _request_list(request.args.get('category', 'all'), _most_prayed_sort())
+
+@bp.route('/answered')
+@conditional(content_version)
+def answered():
+    names = _selected(REQUEST_FIELDS, LIST_FIELDS + ('testimony', 'updated_at'))
+    query = PrayerRequest.card_query().filter_by(is_answered=True, is_public=True) \
+        .options(*_only(PrayerRequest, REQUEST_FIELDS, names))
+    return jsonify(_page(query, (PrayerRequest.updated_at, PrayerRequest.id),
+                         REQUEST_FIELDS, names, count_key=('answered',)))
+
+def _prayers_query(id):
+    # Public prayer notes, with just the praying member's username
+    return Prayer.query.filter_by(request_id=id, is_private=False) \
+        .options(joinedload(Prayer.user).load_only(User.username))
+
+def _encouragements_query(id):
+    return Encouragement.query.filter_by(request_id=id) \
+        .options(joinedload(Encouragement.author).load_only(User.username))
+
+def _visible_request(id, names=None):
+    query = PrayerRequest.card_query()
+    if names is not None:
+        # Access checks need these whatever fields were asked for
+        query = query.options(*_only(PrayerRequest, REQUEST_FIELDS, names),
+                              load_only(PrayerRequest.is_private, PrayerRequest.user_id))
+    prayer_request = query.filter_by(id=id).first_or_404()
+    _check_access(prayer_request)
+    return prayer_request
+
+@bp.route('/requests/<int:id>')
+@conditional(_request_version)
+def request_detail(id):
+    names = _selected(list(REQUEST_FIELDS) + list(DETAIL_EXTRAS),
+                      list(REQUEST_FIELDS) + list(DETAIL_EXTRAS))
+    prayer_request = _visible_request(id, names)
+
+    data = _serialize([prayer_request], REQUEST_FIELDS, names)[0]
+    # First page of each; follow next_cursor on the list endpoints below
+    if 'prayers' in names:
+        data['prayers'] = _page(_prayers_query(id), (Prayer.created_at, Prayer.id),
+                                PRAYER_FIELDS, list(PRAYER_FIELDS), cursor='')
+    if 'encouragements' in names:
+        data['encouragements'] = _page(_encouragements_query(id),
+                                       (Encouragement.created_at, Encouragement.id),
+                                       ENCOURAGEMENT_FIELDS, list(ENCOURAGEMENT_FIELDS), cursor='')
+    return jsonify(data)
+
+@bp.route('/requests/<int:id>/prayers')
+@conditional(_request_version)
+def request_prayers(id):
+    _visible_request(id, ())
+    names = _selected(PRAYER_FIELDS, PRAYER_FIELDS)
+    query = _prayers_query(id).options(*_only(Prayer, PRAYER_FIELDS, names))
+    return jsonify(_page(query, (Prayer.created_at, Prayer.id), PRAYER_FIELDS, names))
+
+@bp.route('/requests/<int:id>/encouragements')
+@conditional(_request_version)
+def request_encouragements(id):
+    _visible_request(id, ())
+    names = _selected(ENCOURAGEMENT_FIELDS, ENCOURAGEMENT_FIELDS)
+    query = _encouragements_query(id).options(*_only(Encouragement, ENCOURAGEMENT_FIELDS, names))
+    return jsonify(_page(query, (Encouragement.created_at, Encouragement.id),
+                         ENCOURAGEMENT_FIELDS, names))
@@ -1,115 +1,118 @@
-from flask import Blueprint, render_template
-from app.models import db, PrayerRequest, DailyFeaturedPrayer, Prayer
+from flask import Blueprint, render_template, request, abort, Response
+from app.models import fits_bigint, PrayerRequest, DailyFeaturedPrayer, PrayerDailyCount
 from datetime import datetime, date
-from sqlalchemy import func, desc
+from sqlalchemy import desc, select
+from sqlalchemy.orm import joinedload
+from app.advent import advent_calendar
+from app.http_cache import conditional, content_version, shared_view
+from app.live import counter_hub
+from app.stats import community_stats
 
 bp = Blueprint('main', __name__)
 
+def _advent_day():
+    # Current day of Advent (1-25 in December, 1 the rest of the year)
+    now = datetime.now()
+    return now.day if now.month == 12 else 1
+
+def _home_version():
+    # Today's featured row can be repointed at another request in place
+    today = date.today()
+    featured = [select(column).where(DailyFeaturedPrayer.date == today).scalar_subquery()
+                for column in (DailyFeaturedPrayer.id, DailyFeaturedPrayer.request_id)]
+    return (*content_version(*featured), today, community_stats.version())
+
+def _advent_version():
+    return (_advent_day(), advent_calendar.version)
+
 @bp.route('/')
+@conditional(_home_version)
 def index():
     # Get featured prayer of the day
     today = date.today()
-    featured = DailyFeaturedPrayer.query.filter_by(date=today).first()
+    featured = DailyFeaturedPrayer.query.options(
+        joinedload(DailyFeaturedPrayer.prayer_request).joinedload(PrayerRequest.author)
+    ).filter_by(date=today).first()
     featured_request = featured.prayer_request if featured else None
     
     # Get recent prayer requests (approved only)
-    recent_requests = PrayerRequest.query.filter_by(
+    recent_requests = PrayerRequest.card_query().filter_by(
         is_public=True,
         is_private=False
     ).order_by(desc(PrayerRequest.created_at)).limit(6).all()
     
     # Get community stats
-    total_prayers = Prayer.query.count()
-    total_requests = PrayerRequest.query.filter_by(is_public=True).count()
-    answered_prayers = PrayerRequest.query.filter_by(is_answered=True).count()
+    stats = community_stats.get()
     
     return render_template('index.html',
                          featured_request=featured_request,
                          recent_requests=recent_requests,
-                         total_prayers=total_prayers,
-                         total_requests=total_requests,
-                         answered_prayers=answered_prayers)
+                         total_prayers=stats['total_prayers'],
+                         total_requests=stats['total_requests'],
+                         answered_prayers=stats['answered_prayers'])
 
 @bp.route('/about')
 def about():
     return render_template('about.html')
 
 @bp.route('/community-impact')
+@conditional(lambda: (*content_version(), datetime.utcnow().date(), community_stats.version()))
 def community_impact():
-    # Total prayers offered
-    total_prayers = Prayer.query.count()
+    # Totals and category breakdown
+    stats = community_stats.get()
     
-    # Total requests
-    total_requests = PrayerRequest.query.filter_by(is_public=True).count()
-    
-    # Answered prayers
-    answered_prayers = PrayerRequest.query.filter_by(is_answered=True).count()
-    
-    # Category breakdown
-    category_stats = db.session.query(
-        PrayerRequest.category,
-        func.count(PrayerRequest.id).label('count')
-    ).filter_by(is_public=True).group_by(PrayerRequest.category).all()
-    
-    # Most prayed for today
-    today = date.today()
-    most_prayed_today = db.session.query(
-        PrayerRequest,
-        func.count(Prayer.id).label('prayer_count')
-    ).join(Prayer).filter(
-        func.date(Prayer.created_at) == today,
-        PrayerRequest.is_public == True
-    ).group_by(PrayerRequest.id).order_by(desc('prayer_count')).limit(5).all()
+    # Most prayed for today, from the daily rollup
+    today = datetime.utcnow().date()
+    most_prayed_today = PrayerDailyCount.leaderboard(today, today, limit=5)
     
     return render_template('community_impact.html',
-                         total_prayers=total_prayers,
-                         total_requests=total_requests,
-                         answered_prayers=answered_prayers,
-                         category_stats=category_stats,
+                         total_prayers=stats['total_prayers'],
+                         total_requests=stats['total_requests'],
+                         answered_prayers=stats['answered_prayers'],
+                         category_stats=stats['category_stats'],
                          most_prayed_today=most_prayed_today)
 
 @bp.route('/advent')
+@conditional(_advent_version)
 def advent():
-    from app.models import AdventReflection
-    
     # Get current day (1-25 for December)
-    current_day = datetime.now().day
-    if datetime.now().month != 12:
-        current_day = 1
-    
-    # Get all reflections up to current day
-    reflections = AdventReflection.query.filter(
-        AdventReflection.day <= current_day
-    ).order_by(AdventReflection.day).all()
+    current_day = _advent_day()
     
-    # Get today's reflection
-    today_reflection = AdventReflection.query.filter_by(day=current_day).first()
+    def render():
+        return render_template('advent.html',
+                             reflections=advent_calendar.until(current_day),
+                             today_reflection=advent_calendar.for_day(current_day),
+                             current_day=current_day)
     
-    return render_template('advent.html',
-                         reflections=reflections,
-                         today_reflection=today_reflection,
-                         current_day=current_day)
+    # Every anonymous visitor sees the same page for the day
+    if shared_view():
+        return advent_calendar.cached_page(current_day, render)
+    return render()
 
 @bp.route('/christmas-eve')
 def christmas_eve():
     from config import Config
     prayer_time = Config.CHRISTMAS_EVE_PRAYER_TIME
     
-    return render_template('christmas_eve.html', prayer_time=prayer_time)
+    return render_template('christmas_eve.html', prayer_time=prayer_time,
+                         total_prayers=community_stats.get()['total_prayers'])
 
 @bp.route('/prayer-tree')
 def prayer_tree():
-    # Get total prayers
-    total_prayers = Prayer.query.count()
-    
-    # Get category breakdown
-    category_counts = {}
-    for category in ['Family', 'Health', 'Finances', 'Relationships', 'Grief', 'Gratitude']:
-        count = db.session.query(func.count(Prayer.id)).join(PrayerRequest).filter(
-            PrayerRequest.category == category
-        ).scalar()
-        category_counts[category] = count or 0
+    stats = community_stats.get()
     
     return render_template('prayer_tree.html',
-                         total_prayers=total_prayers,
-                         category_counts=category_counts)
+                         total_prayers=stats['total_prayers'],
+                         category_counts=stats['category_prayers'])
+
+@bp.route('/live/counts')
+def live_counts():
+    # Optionally follow one request's count too; private ones aren't streamed
+    request_id = request.args.get('request', type=int)
+    if request_id is not None and (not fits_bigint(request_id) or
+                                   not PrayerRequest.query.filter_by(id=request_id, is_private=False).count()):
+        abort(404)
+    
+    # The stream outlives the request context, so it holds no DB connection
+    return Response(counter_hub.stream(request_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
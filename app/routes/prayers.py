@@ -1,21 +1,30 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
+import csv
+import io
+import json
+from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, jsonify, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from app.models import db, PrayerRequest, Prayer, Encouragement, Report, PrayerStats
+from app.models import db, fits_bigint, PrayerRequest, Prayer, Encouragement, Report, PrayerStats, PrayerDailyCount
 from app.forms import PrayerRequestForm, EncouragementForm, PrayerNoteForm
-from datetime import date
-from sqlalchemy import desc, func
+from app.fragments import card_cache
+from app.http_cache import conditional, content_version
+from app.metrics import metrics
+from app.counters import add_prayer, record_prayers, record_encouragement
+from app.pagination import keyset_paginate
+from app.search import search_requests
+from app.stats import community_stats
+from app.surge import prayer_buffer
+from datetime import datetime, timedelta
+from sqlalchemy import case, desc, func, select
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('prayers', __name__, url_prefix='/prayers')
 
-@bp.route('/feed')
-def feed():
-    # Get filter parameters
-    category = request.args.get('category', 'all')
-    sort_by = request.args.get('sort', 'recent')  # recent, most_prayed
-    page = request.args.get('page', 1, type=int)
-    
+CATEGORIES = ['Family', 'Health', 'Finances', 'Relationships', 'Grief', 'Gratitude']
+
+def _feed_query(category, sort_by):
+    """Return (query, sort key columns) for the public feed."""
     # Base query
-    query = PrayerRequest.query.filter_by(is_public=True, is_private=False)
+    query = PrayerRequest.card_query().filter_by(is_public=True, is_private=False)
     
     # Apply category filter
     if category != 'all':
@@ -23,36 +32,74 @@ def feed():
     
     # Apply sorting
     if sort_by == 'most_prayed':
-        # Get requests with prayer counts
-        subquery = db.session.query(
-            Prayer.request_id,
-            func.count(Prayer.id).label('prayer_count')
-        ).group_by(Prayer.request_id).subquery()
+        # Stored counter, read in order straight off the most-prayed index
+        return query, (PrayerRequest.prayer_count, PrayerRequest.id)
+    elif sort_by == 'most_prayed_week':
+        # Summed from the last 7 days of the daily rollup
+        weekly = PrayerDailyCount.window(datetime.utcnow().date() - timedelta(days=6))
         
-        query = query.outerjoin(
-            subquery,
-            PrayerRequest.id == subquery.c.request_id
-        ).order_by(desc(subquery.c.prayer_count))
+        query = query.join(weekly, PrayerRequest.id == weekly.c.request_id)
+        return query, (weekly.c.prayer_count, PrayerRequest.id)
     elif sort_by == 'urgent':
-        query = query.filter_by(is_urgent=True).order_by(desc(PrayerRequest.created_at))
-    else:  # recent
-        query = query.order_by(desc(PrayerRequest.created_at))
+        query = query.filter_by(is_urgent=True)
     
-    # Paginate
-    from config import Config
-    pagination = query.paginate(page=page, per_page=Config.REQUESTS_PER_PAGE, error_out=False)
-    requests = pagination.items
+    return query, (PrayerRequest.created_at, PrayerRequest.id)
+
+def _feed_version(sort_by=None):
+    """content_version, plus the UTC day for the weekly ranking, whose window moves daily."""
+    if (sort_by or request.args.get('sort')) == 'most_prayed_week':
+        return (*content_version(), datetime.utcnow().date())
+    return content_version()
+
+def _feed_page(category, sort_by):
+    query, sort_key = _feed_query(category, sort_by)
+    return keyset_paginate(query, sort_key,
+                           cursor=request.args.get('cursor'),
+                           per_page=current_app.config['REQUESTS_PER_PAGE'],
+                           count_key=('feed', category, sort_by))
+
+@bp.route('/feed')
+@conditional(_feed_version)
+def feed():
+    # Get filter parameters
+    category = request.args.get('category', 'all')
+    sort_by = request.args.get('sort', 'recent')  # recent, most_prayed, most_prayed_week, urgent
     
-    # Get categories for filter
-    categories = ['Family', 'Health', 'Finances', 'Relationships', 'Grief', 'Gratitude']
+    pagination = _feed_page(category, sort_by)
     
     return render_template('prayers/feed.html',
-                         requests=requests,
+                         requests=pagination.items,
                          pagination=pagination,
-                         categories=categories,
+                         categories=CATEGORIES,
                          current_category=category,
                          current_sort=sort_by)
 
+@bp.route('/feed/more')
+def feed_more():
+    """Next page of feed cards as JSON, for infinite scroll."""
+    category = request.args.get('category', 'all')
+    sort_by = request.args.get('sort', 'recent')
+    
+    pagination = _feed_page(category, sort_by)
+    html = ''.join(card_cache.render('prayers/_feed_card.html', prayer_request)
+                   for prayer_request in pagination.items)
+    
+    return jsonify(html=html, next_cursor=pagination.next_cursor)
+
+@bp.route('/search')
+def search():
+    q = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    requests, has_next = search_requests(q, page=page,
+                                         per_page=current_app.config['REQUESTS_PER_PAGE'])
+    
+    return render_template('prayers/search.html',
+                         requests=requests,
+                         q=q,
+                         page=page,
+                         has_next=has_next)
+
 @bp.route('/create', methods=['GET', 'POST'])
 @login_required
 def create():
@@ -73,37 +120,52 @@ def create():
         
         db.session.add(prayer_request)
         db.session.commit()
+        community_stats.invalidate()
+        metrics.inc('prayer_requests_created_total', category=prayer_request.category)
         
         flash('Your prayer request has been submitted.', 'success')
         return redirect(url_for('prayers.view', id=prayer_request.id))
     
     return render_template('prayers/create.html', form=form)
 
-@bp.route('/view/<int:id>')
-def view(id):
-    prayer_request = PrayerRequest.query.get_or_404(id)
-    
-    # Check access permissions
+def _request_version(id):
+    # Everything the request page shows moves one of these
+    version = db.session.query(
+        PrayerRequest.updated_at, PrayerRequest.prayer_count,
+        PrayerRequest.encouragement_count, PrayerRequest.is_private
+    ).filter_by(id=id).first()
+    if version is None or version.is_private:
+        return None
+    return tuple(version)
+
+def _check_access(prayer_request):
+    # Private requests are only shown to their author and admins
     if prayer_request.is_private:
         if not current_user.is_authenticated or \
            (current_user.id != prayer_request.user_id and not current_user.is_admin):
             abort(403)
+
+@bp.route('/view/<int:id>')
+@conditional(_request_version)
+def view(id):
+    prayer_request = PrayerRequest.card_query().get_or_404(id)
+    _check_access(prayer_request)
     
     # Get prayers (public ones for display)
-    public_prayers = Prayer.query.filter_by(
+    public_prayers = Prayer.query.options(joinedload(Prayer.user)).filter_by(
         request_id=id,
         is_private=False
     ).order_by(desc(Prayer.created_at)).all()
     
     # Get encouragements
-    encouragements = Encouragement.query.filter_by(
+    encouragements = Encouragement.query.options(joinedload(Encouragement.author)).filter_by(
         request_id=id
     ).order_by(desc(Encouragement.created_at)).all()
     
     # Check if current user has prayed
     has_prayed = False
     if current_user.is_authenticated:
-        has_prayed = Prayer.query.filter_by(
+        has_prayed = prayer_buffer.is_pending(current_user.id, id) or Prayer.query.filter_by(
             user_id=current_user.id,
             request_id=id
         ).first() is not None
@@ -119,46 +181,75 @@ def view(id):
 def pray(id):
     prayer_request = PrayerRequest.query.get_or_404(id)
     
-    # Check if user already prayed
-    existing_prayer = Prayer.query.filter_by(
-        user_id=current_user.id,
-        request_id=id
-    ).first()
+    # Surge mode: queue the click and acknowledge straight away; the
+    # buffer writes it (or drops it as a repeat) in its next batch
+    if prayer_buffer.is_active():
+        if prayer_buffer.submit(current_user.id, id, prayer_request.category):
+            flash('Thank you for praying!', 'success')
+        else:
+            flash('You have already prayed for this request.', 'info')
+        return redirect(url_for('prayers.view', id=id))
     
-    if existing_prayer:
+    # Insert-or-skip: a repeat click, even one racing this request in
+    # another worker, lands on the unique index instead of raising
+    if not add_prayer(current_user.id, id):
+        db.session.rollback()
         flash('You have already prayed for this request.', 'info')
         return redirect(url_for('prayers.view', id=id))
     
-    # Create prayer
-    prayer = Prayer(
-        user_id=current_user.id,
-        request_id=id
-    )
-    
-    db.session.add(prayer)
-    
-    # Update prayer stats
-    today = date.today()
-    stat = PrayerStats.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    if stat:
-        stat.prayers_offered += 1
-    else:
-        stat = PrayerStats(
-            user_id=current_user.id,
-            date=today,
-            prayers_offered=1
-        )
-        db.session.add(stat)
-    
     db.session.commit()
+    community_stats.record_prayer(prayer_request.category)
+    card_cache.invalidate(id)
+    metrics.inc('prayers_offered_total', category=prayer_request.category)
     
     flash('Thank you for praying!', 'success')
     return redirect(url_for('prayers.view', id=id))
 
+@bp.route('/pray/batch', methods=['POST'])
+@login_required
+def pray_batch():
+    """
+    Pray for many requests at once: {"ids": [...]} in, a result per id out
+    (prayed, already_prayed, queued in surge mode, or not_found). Only JSON
+    bodies are accepted, which a cross-site form can't send.
+    """
+    data = request.get_json(silent=True)
+    ids = data.get('ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or \
+            not all(isinstance(i, int) and not isinstance(i, bool) and fits_bigint(i) for i in ids):
+        return jsonify(error='Expected a JSON body like {"ids": [1, 2, 3]}'), 400
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > current_app.config['PRAY_BATCH_MAX']:
+        return jsonify(error=f"At most {current_app.config['PRAY_BATCH_MAX']} requests per batch"), 400
+
+    categories = dict(db.session.execute(
+        select(PrayerRequest.id, PrayerRequest.category).where(PrayerRequest.id.in_(ids))
+    ).all())
+    results = {id: 'not_found' for id in ids if id not in categories}
+
+    if prayer_buffer.is_active():
+        for id, category in categories.items():
+            queued = prayer_buffer.submit(current_user.id, id, category)
+            results[id] = 'queued' if queued else 'already_prayed'
+        return jsonify(results=results)
+
+    # One existence check, one insert and one executemany per counter
+    inserted = record_prayers((current_user.id, id) for id in categories)
+    db.session.commit()
+
+    for _, id in inserted:
+        community_stats.record_prayer(categories[id])
+        card_cache.invalidate(id)
+        metrics.inc('prayers_offered_total', category=categories[id])
+    prayed = {id for _, id in inserted}
+    for id in categories:
+        results[id] = 'prayed' if id in prayed else 'already_prayed'
+
+    prayer_counts = dict(db.session.execute(
+        select(PrayerRequest.id, PrayerRequest.prayer_count).where(PrayerRequest.id.in_(list(categories)))
+    ).all())
+    return jsonify(results=results, prayer_counts=prayer_counts)
+
 @bp.route('/pray-note/<int:id>', methods=['GET', 'POST'])
 @login_required
 def pray_with_note(id):
@@ -166,44 +257,18 @@ def pray_with_note(id):
     form = PrayerNoteForm()
     
     if form.validate_on_submit():
-        # Check if user already prayed
-        existing_prayer = Prayer.query.filter_by(
-            user_id=current_user.id,
-            request_id=id
-        ).first()
-        
-        if existing_prayer:
+        # Insert-or-skip, as in pray()
+        if not add_prayer(current_user.id, id,
+                          prayer_note=form.prayer_note.data,
+                          is_private=form.is_private.data):
+            db.session.rollback()
             flash('You have already prayed for this request.', 'info')
             return redirect(url_for('prayers.view', id=id))
         
-        # Create prayer with note
-        prayer = Prayer(
-            user_id=current_user.id,
-            request_id=id,
-            prayer_note=form.prayer_note.data,
-            is_private=form.is_private.data
-        )
-        
-        db.session.add(prayer)
-        
-        # Update prayer stats
-        today = date.today()
-        stat = PrayerStats.query.filter_by(
-            user_id=current_user.id,
-            date=today
-        ).first()
-        
-        if stat:
-            stat.prayers_offered += 1
-        else:
-            stat = PrayerStats(
-                user_id=current_user.id,
-                date=today,
-                prayers_offered=1
-            )
-            db.session.add(stat)
-        
         db.session.commit()
+        community_stats.record_prayer(prayer_request.category)
+        card_cache.invalidate(id)
+        metrics.inc('prayers_offered_total', category=prayer_request.category)
         
         flash('Thank you for praying!', 'success')
         return redirect(url_for('prayers.view', id=id))
@@ -225,7 +290,10 @@ def encourage(id):
         )
         
         db.session.add(encouragement)
+        record_encouragement(id)
         db.session.commit()
+        card_cache.invalidate(id)
+        metrics.inc('encouragements_total')
         
         flash('Your encouragement has been shared.', 'success')
         return redirect(url_for('prayers.view', id=id))
@@ -247,25 +315,27 @@ def mark_answered(id):
     prayer_request.testimony = testimony
     
     db.session.commit()
+    community_stats.invalidate()
+    card_cache.invalidate(id)
     
     flash('Prayer marked as answered! Glory to God!', 'success')
     return redirect(url_for('prayers.view', id=id))
 
 @bp.route('/answered')
+@conditional(content_version)
 def answered():
-    page = request.args.get('page', 1, type=int)
-    
-    query = PrayerRequest.query.filter_by(
+    query = PrayerRequest.card_query().filter_by(
         is_answered=True,
         is_public=True
-    ).order_by(desc(PrayerRequest.updated_at))
+    )
     
-    from config import Config
-    pagination = query.paginate(page=page, per_page=Config.REQUESTS_PER_PAGE, error_out=False)
-    requests = pagination.items
+    pagination = keyset_paginate(query, (PrayerRequest.updated_at, PrayerRequest.id),
+                                 cursor=request.args.get('cursor'),
+                                 per_page=current_app.config['REQUESTS_PER_PAGE'],
+                                 count_key=('answered',))
     
     return render_template('prayers/answered.html',
-                         requests=requests,
+                         requests=pagination.items,
                          pagination=pagination)
 
 @bp.route('/report/<int:id>', methods=['POST'])
@@ -286,6 +356,7 @@ def report(id):
     
     db.session.add(report)
     db.session.commit()
+    metrics.inc('reports_total')
     
     flash('Report submitted. Thank you for helping keep our community safe.', 'info')
     return redirect(url_for('prayers.view', id=id))
@@ -302,22 +373,70 @@ def my_requests():
 @bp.route('/my-prayers')
 @login_required
 def my_prayers():
-    # Get all prayers by current user
-    prayers = Prayer.query.filter_by(
-        user_id=current_user.id
-    ).order_by(desc(Prayer.created_at)).all()
-    
-    # Get stats
-    today = date.today()
-    today_stat = PrayerStats.query.filter_by(
-        user_id=current_user.id,
-        date=today
-    ).first()
-    
-    today_count = today_stat.prayers_offered if today_stat else 0
-    total_count = Prayer.query.filter_by(user_id=current_user.id).count()
+    # One page of the user's prayers with the request and its author joined in
+    query = Prayer.query.options(
+        joinedload(Prayer.request).joinedload(PrayerRequest.author)
+    ).filter_by(user_id=current_user.id)
+    
+    pagination = keyset_paginate(query, (Prayer.created_at, Prayer.id),
+                                 cursor=request.args.get('cursor'),
+                                 per_page=current_app.config['REQUESTS_PER_PAGE'])
+    
+    # Today's and all-time totals from the per-day stats (UTC days), in one query
+    today = datetime.utcnow().date()
+    today_count, total_count = db.session.query(
+        func.coalesce(func.sum(case((PrayerStats.date == today, PrayerStats.prayers_offered), else_=0)), 0),
+        func.coalesce(func.sum(PrayerStats.prayers_offered), 0)
+    ).filter_by(user_id=current_user.id).one()
     
     return render_template('prayers/my_prayers.html',
-                         prayers=prayers,
+                         prayers=pagination.items,
+                         pagination=pagination,
                          today_count=today_count,
                          total_count=total_count)
+
+EXPORT_FIELDS = ('prayed_at', 'request_id', 'title', 'category', 'prayer_note', 'is_private')
+
+def _prayer_history(user_id, batch_size=500):
+    """The user's whole prayer history, oldest first, streamed from the database in batches."""
+    rows = db.session.execute(
+        select(Prayer.created_at, PrayerRequest.id, PrayerRequest.title, PrayerRequest.category,
+               Prayer.prayer_note, Prayer.is_private)
+        .join(PrayerRequest, Prayer.request_id == PrayerRequest.id)
+        .where(Prayer.user_id == user_id)
+        .order_by(Prayer.created_at, Prayer.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in rows:
+        yield dict(zip(EXPORT_FIELDS, (row[0].isoformat(), *row[1:])))
+
+def _csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _json_lines(records):
+    yield '['
+    for i, record in enumerate(records):
+        yield (',\n' if i else '\n') + json.dumps(record)
+    yield '\n]\n'
+
+@bp.route('/my-prayers/export.<fmt>')
+@login_required
+def export_my_prayers(fmt):
+    """Download the user's prayer history, written out row by row as it's read."""
+    formats = {'csv': (_csv_lines, 'text/csv'), 'json': (_json_lines, 'application/json')}
+    if fmt not in formats:
+        abort(404)
+    
+    lines, mimetype = formats[fmt]
+    records = _prayer_history(current_user.id)
+    return Response(stream_with_context(lines(records)), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=my-prayers.{fmt}'
+    })
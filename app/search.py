@@ -0,0 +1,128 @@
+"""
+Full-text search over prayer requests
+
+SQLite uses an FTS5 external-content table kept in sync by triggers on
+prayer_request; PostgreSQL uses a generated tsvector column with a GIN
+index. Either way the index follows creates, edits and testimonies
+(mark answered) on its own, and visibility (private requests, requests
+hidden by moderation) is applied when querying, so toggling it needs no
+reindex.
+"""
+
+import re
+from sqlalchemy import Float, Integer, func, literal_column, or_, select, text
+from app.models import db, PrayerRequest
+
+_FTS_COLUMNS = ('title', 'content', 'bible_verse', 'testimony')
+
+# Relative weight of a hit in each column, in _FTS_COLUMNS order
+_BM25_WEIGHTS = '10.0, 4.0, 2.0, 4.0'
+
+# Deepest page served; relevance ranking runs out of meaning long before,
+# and a huge page would overflow OFFSET
+_MAX_PAGE = 500
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS prayer_request_fts USING fts5(
+        title, content, bible_verse, testimony,
+        content='prayer_request', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS prayer_request_fts_insert AFTER INSERT ON prayer_request BEGIN
+        INSERT INTO prayer_request_fts(rowid, title, content, bible_verse, testimony)
+        VALUES (new.id, new.title, new.content, new.bible_verse, new.testimony);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS prayer_request_fts_delete AFTER DELETE ON prayer_request BEGIN
+        INSERT INTO prayer_request_fts(prayer_request_fts, rowid, title, content, bible_verse, testimony)
+        VALUES ('delete', old.id, old.title, old.content, old.bible_verse, old.testimony);
+    END""",
+    # Only text edits touch the index; counter bumps and flag changes don't
+    """CREATE TRIGGER IF NOT EXISTS prayer_request_fts_update
+    AFTER UPDATE OF title, content, bible_verse, testimony ON prayer_request BEGIN
+        INSERT INTO prayer_request_fts(prayer_request_fts, rowid, title, content, bible_verse, testimony)
+        VALUES ('delete', old.id, old.title, old.content, old.bible_verse, old.testimony);
+        INSERT INTO prayer_request_fts(rowid, title, content, bible_verse, testimony)
+        VALUES (new.id, new.title, new.content, new.bible_verse, new.testimony);
+    END""",
+    "INSERT INTO prayer_request_fts(prayer_request_fts) VALUES ('rebuild')",
+]
+
+_POSTGRESQL_DDL = [
+    """ALTER TABLE prayer_request ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(testimony, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(bible_verse, '')), 'C')
+    ) STORED""",
+    'CREATE INDEX IF NOT EXISTS ix_prayer_request_search ON prayer_request USING GIN (search_vector)',
+]
+
+def create_search_index(conn):
+    """Create (or rebuild) the dialect's full-text index. Used by the migrations."""
+    statements = {'sqlite': _SQLITE_DDL, 'postgresql': _POSTGRESQL_DDL}.get(conn.dialect.name, [])
+    for statement in statements:
+        conn.execute(text(statement))
+
+def _fts5_query(terms):
+    # Quote every term so user input can't inject FTS5 syntax; the last
+    # term is a prefix match so partial words still find something
+    quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def _fts5_ranked(terms, limit):
+    # The best `limit` matches by bm25() (lower is better), ranked inside
+    # the FTS query so only they are joined to prayer_request and sorted
+    return text(
+        f'SELECT rowid AS id, bm25(prayer_request_fts, {_BM25_WEIGHTS}) AS rank '
+        'FROM prayer_request_fts WHERE prayer_request_fts MATCH :match '
+        'ORDER BY rank, rowid DESC LIMIT :limit'
+    ).bindparams(match=_fts5_query(terms), limit=limit).columns(id=Integer, rank=Float).subquery()
+
+def search_requests(q, page=1, per_page=20):
+    """
+    Visible requests matching `q`, best match first. Returns (items,
+    has_next). Pages are fetched with LIMIT/OFFSET and no COUNT; pages past
+    _MAX_PAGE come back empty.
+    """
+    terms = re.findall(r'\w+', q or '')
+    if not terms or page > _MAX_PAGE:
+        return [], False
+    page = max(page, 1)
+    wanted = page * per_page + 1
+
+    query = PrayerRequest.card_query().filter(
+        PrayerRequest.is_public == True,
+        PrayerRequest.is_private == False
+    )
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        # Over-fetch to leave room for matches the visibility filter drops;
+        # if the window was full and still came up short, widen it and retry
+        limit = wanted * 2
+        while True:
+            ranked = _fts5_ranked(terms, limit)
+            rows = query.join(ranked, PrayerRequest.id == ranked.c.id) \
+                .order_by(ranked.c.rank, PrayerRequest.id.desc()) \
+                .offset((page - 1) * per_page).limit(per_page + 1).all()
+            if (page - 1) * per_page + len(rows) >= wanted or \
+                    db.session.scalar(select(func.count()).select_from(ranked)) < limit:
+                break
+            limit *= 4
+        return rows[:per_page], len(rows) > per_page and page < _MAX_PAGE
+
+    if dialect == 'postgresql':
+        tsquery = func.websearch_to_tsquery('english', ' '.join(terms))
+        vector = literal_column('prayer_request.search_vector')
+        query = query.filter(vector.op('@@')(tsquery)) \
+            .order_by(func.ts_rank_cd(vector, tsquery).desc(), PrayerRequest.id.desc())
+    else:
+        # No full-text index on other dialects: plain substring match
+        pattern = f'%{" ".join(terms)}%'
+        query = query.filter(or_(*[getattr(PrayerRequest, column).ilike(pattern)
+                                   for column in _FTS_COLUMNS])) \
+            .order_by(PrayerRequest.created_at.desc())
+
+    rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page and page < _MAX_PAGE
@@ -0,0 +1,69 @@
+"""
+Cached community-wide statistics for the home, community impact and
+prayer tree pages
+"""
+
+import threading
+from sqlalchemy import case, func
+from app.cache import TTLCache
+from app.models import db, PrayerRequest
+
+class CommunityStats:
+    """
+    All community totals come from one GROUP BY over prayer_request (the
+    stored prayer_count column stands in for counting Prayer rows) and are
+    cached for COMMUNITY_STATS_TTL seconds. New prayers are added to the
+    cached snapshot in place; request-level changes (new, answered, hidden)
+    drop it so the next reader recomputes.
+    """
+
+    def __init__(self, ttl=60):
+        self._cache = TTLCache(maxsize=1, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._cache.ttl = app.config['COMMUNITY_STATS_TTL']
+
+    def get(self):
+        return self._cache.get_or_set('stats', self._compute)
+
+    def version(self):
+        """
+        The snapshot this process would render, for ETags. The cache is per
+        worker and lags other workers' prayers by up to the TTL, so pages
+        showing it must not be versioned on the database alone.
+        """
+        stats = self.get()
+        return (stats['total_prayers'], stats['total_requests'], stats['answered_prayers'],
+                tuple(stats['category_stats']), tuple(sorted(stats['category_prayers'].items())))
+
+    def invalidate(self):
+        self._cache.invalidate()
+
+    def record_prayer(self, category, amount=1):
+        with self._lock:
+            stats = self._cache.get('stats')
+            if stats is None:
+                return
+            stats['total_prayers'] += amount
+            stats['category_prayers'][category] = stats['category_prayers'].get(category, 0) + amount
+
+    def _compute(self):
+        rows = db.session.query(
+            PrayerRequest.category,
+            func.sum(case((PrayerRequest.is_public == True, 1), else_=0)),
+            func.sum(case((PrayerRequest.is_answered == True, 1), else_=0)),
+            func.coalesce(func.sum(PrayerRequest.prayer_count), 0)
+        ).group_by(PrayerRequest.category).all()
+
+        return {
+            'total_prayers': sum(row[3] for row in rows),
+            'total_requests': sum(row[1] for row in rows),
+            'answered_prayers': sum(row[2] for row in rows),
+            # Public requests per category, as (category, count) pairs
+            'category_stats': [(row[0], row[1]) for row in rows if row[1]],
+            # Prayers offered per category
+            'category_prayers': {row[0]: row[3] for row in rows}
+        }
+
+community_stats = CommunityStats()
@@ -0,0 +1,103 @@
+"""
+Christmas Eve surge mode
+
+Around CHRISTMAS_EVE_PRAYER_TIME most of the community presses "pray" in
+the same minute. In surge mode the pray route only queues the click in
+memory and answers straight away; a background thread writes the queue in
+batched transactions through record_prayers(). Each worker process has
+its own queue. One prayer per user per request is still guaranteed: a
+pair already queued in this process is not queued twice, and across
+processes the set-based existence check plus the unique index on
+(user_id, request_id) drop anything already recorded.
+
+Clicks still queued when a process dies are lost, so the flush interval
+bounds what a crash can cost.
+"""
+
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from app.models import db
+from app.counters import record_prayers
+from app.fragments import card_cache
+from app.metrics import metrics
+from app.stats import community_stats
+
+class PrayerBuffer:
+    def __init__(self):
+        self.app = None
+        self._queue = deque()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        if self.app is None:
+            atexit.register(self.flush)
+        self.app = app
+
+    def is_active(self):
+        """Whether prayer clicks should be buffered right now."""
+        mode = self.app.config['PRAYER_SURGE_MODE']
+        if mode == 'auto':
+            prayer_time = datetime.strptime(self.app.config['CHRISTMAS_EVE_PRAYER_TIME'], '%Y-%m-%d %H:%M:%S')
+            window = timedelta(minutes=self.app.config['PRAYER_SURGE_WINDOW_MINUTES'])
+            return prayer_time - window <= datetime.now() <= prayer_time + window
+        return mode == 'on'
+
+    def submit(self, user_id, request_id, category):
+        """Queue a prayer. Returns False if this user's prayer is already queued."""
+        key = (user_id, request_id)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            self._queue.append((user_id, request_id, category))
+            queued = len(self._queue)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='prayer-buffer', daemon=True)
+                self._thread.start()
+
+        if queued >= self.app.config['PRAYER_SURGE_BATCH_SIZE']:
+            self._wake.set()
+        return True
+
+    def is_pending(self, user_id, request_id):
+        return (user_id, request_id) in self._pending
+
+    def flush(self):
+        """Write everything queued so far in one transaction. Returns the number recorded."""
+        with self._lock:
+            batch = list(self._queue)
+            self._queue.clear()
+        if not batch:
+            return 0
+
+        categories = {request_id: category for _, request_id, category in batch}
+        try:
+            with self.app.app_context():
+                inserted = record_prayers((user_id, request_id) for user_id, request_id, _ in batch)
+                db.session.commit()
+        except Exception:
+            self.app.logger.exception('Failed to flush %d buffered prayers; requeueing', len(batch))
+            with self._lock:
+                self._queue.extendleft(reversed(batch))
+            return 0
+
+        for _, request_id in inserted:
+            community_stats.record_prayer(categories[request_id])
+            card_cache.invalidate(request_id)
+            metrics.inc('prayers_offered_total', category=categories[request_id])
+        with self._lock:
+            self._pending.difference_update((user_id, request_id) for user_id, request_id, _ in batch)
+        return len(inserted)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.app.config['PRAYER_SURGE_FLUSH_INTERVAL'])
+            self._wake.clear()
+            self.flush()
+
+prayer_buffer = PrayerBuffer()
@@ -0,0 +1,52 @@
+"""
+Cached user loading for Flask-Login
+
+Pages only ever read a handful of fields off current_user, so instead of
+a User SELECT on every authenticated request the loader serves a small
+snapshot from a per-process LRU cache. Privilege changes invalidate the
+entry in the worker that made them; other workers pick the change up
+within USER_CACHE_TTL seconds.
+"""
+
+from flask_login import UserMixin
+from app.cache import TTLCache
+from app.models import db, User
+
+class CachedUser(UserMixin):
+    """Read-only stand-in for User carrying the fields templates need."""
+
+    def __init__(self, id, username, email, is_admin):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = is_admin
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.email, bool(user.is_admin))
+
+class UserCache:
+    def __init__(self):
+        self._cache = TTLCache()
+
+    def init_app(self, app):
+        self._cache.maxsize = app.config['USER_CACHE_SIZE']
+        self._cache.ttl = app.config['USER_CACHE_TTL']
+
+    def load(self, user_id):
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+
+        cached = CachedUser.from_user(user)
+        self._cache.set(user_id, cached)
+        return cached
+
+    def invalidate(self, user_id=None):
+        self._cache.invalidate(user_id)
+
+user_cache = UserCache()
@@ -0,0 +1,214 @@
+"""
+Latency, query-count and memory budgets for the main pages
+
+Builds the app against a benchmark dataset (see generate_data.py) and
+drives the Flask test client over the public pages, every feed
+sort/category, a busy request page, My Prayers for the most active
+member and the admin pages. For each endpoint it records p50/p95
+latency, SQL statements per request and peak Python memory allocated
+while serving one request (tracemalloc, measured in a separate pass so it
+doesn't skew the timings).
+
+Results are compared with a stored baseline. An endpoint regresses if it
+runs more statements than before, or its median latency or peak memory
+grow beyond --tolerance (p95 gets twice the headroom, being noisier). Any
+regression makes the run exit non-zero.
+
+    python -m benchmarks.generate_data
+    python -m benchmarks.endpoints --save-baseline     # on main
+    python -m benchmarks.endpoints                     # on your branch
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from sqlalchemy import event, func
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+SORTS = ['recent', 'most_prayed', 'most_prayed_week', 'urgent']
+
+def make_config(database_url):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        PRAYER_SURGE_MODE = 'off'
+        WTF_CSRF_ENABLED = False
+    return BenchConfig
+
+def endpoints(app):
+    """(name, url, user id or None) for every page under budget."""
+    from app.models import db, User, PrayerRequest, Prayer
+    from app.routes.prayers import CATEGORIES
+
+    with app.app_context():
+        admin = db.session.query(func.min(User.id)).filter(User.is_admin == True).scalar()
+        intercessor = db.session.query(Prayer.user_id).group_by(Prayer.user_id) \
+            .order_by(func.count(Prayer.id).desc()).limit(1).scalar()
+        busiest = db.session.query(PrayerRequest.id).filter_by(is_public=True, is_private=False) \
+            .order_by(PrayerRequest.prayer_count.desc()).limit(1).scalar()
+    if not (admin and intercessor and busiest):
+        sys.exit('The benchmark database looks empty; run python -m benchmarks.generate_data first')
+
+    pages = [
+        ('home', '/', None),
+        ('home (logged in)', '/', intercessor),
+        ('community impact', '/community-impact', None),
+        ('prayer tree', '/prayer-tree', None),
+        ('advent', '/advent', None),
+        ('answered', '/prayers/answered', None),
+        ('view busiest request', f'/prayers/view/{busiest}', None),
+        ('view busiest request (logged in)', f'/prayers/view/{busiest}', intercessor),
+        ('search', '/prayers/search?q=healing', None),
+        ('api feed', '/api/v1/feed', None),
+        ('api most prayed this week', '/api/v1/most-prayed?period=week', None),
+        ('api request detail', f'/api/v1/requests/{busiest}', None),
+        ('my prayers', '/prayers/my-prayers', intercessor),
+        ('admin dashboard', '/admin/dashboard', admin),
+        ('admin users', '/admin/users', admin),
+        ('admin users search', '/admin/users?q=member12', admin),
+        ('admin reports', '/admin/reports', admin),
+        ('admin requests', '/admin/requests', admin),
+    ]
+    for sort in SORTS:
+        for category in ['all'] + CATEGORIES:
+            pages.append((f'feed {sort}/{category}', f'/prayers/feed?sort={sort}&category={category}', None))
+    return pages
+
+def reset_caches():
+    """Drop every in-process cache so each request pays its full cost."""
+    from app.advent import advent_calendar
+    from app.fragments import card_cache
+    from app.pagination import _count_cache
+    from app.stats import community_stats
+    from app.user_cache import user_cache
+
+    advent_calendar.reload()
+    card_cache.invalidate()
+    community_stats.invalidate()
+    user_cache.invalidate()
+    _count_cache.invalidate()
+
+def client_for(app, user_id):
+    client = app.test_client()
+    if user_id is not None:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+    return client
+
+def measure(app, url, user_id, iterations, warmup, cold):
+    from app.models import db
+
+    client = client_for(app, user_id)
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def count(*args):
+        statements[-1] += 1
+
+    for _ in range(warmup):
+        client.get(url)
+
+    gc.collect()
+    latencies = []
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        for _ in range(iterations):
+            if cold:
+                reset_caches()
+            statements.append(0)
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} answered {response.status_code}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    if cold:
+        reset_caches()
+    tracemalloc.start()
+    client.get(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+        'queries': max(statements),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+def regressions(result, baseline, tolerance):
+    problems = []
+    if result['queries'] > baseline['queries']:
+        problems.append(f"queries {baseline['queries']} -> {result['queries']}")
+    # The median gates latency; a handful of samples makes p95 noisy, so it
+    # only fails on a clear blowup. Absolute slack keeps fast pages steady.
+    if result['p50_ms'] > baseline['p50_ms'] * tolerance + 1:
+        problems.append(f"p50 {baseline['p50_ms']}ms -> {result['p50_ms']}ms")
+    if result['p95_ms'] > baseline['p95_ms'] * tolerance * 2 + 2:
+        problems.append(f"p95 {baseline['p95_ms']}ms -> {result['p95_ms']}ms")
+    if result['peak_kib'] > baseline['peak_kib'] * tolerance + 64:
+        problems.append(f"memory {baseline['peak_kib']}KiB -> {result['peak_kib']}KiB")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL') or
+                        'sqlite:///' + os.path.join(ROOT, 'benchmark.db'))
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cold', action='store_true',
+                        help='clear in-process caches before every request')
+    parser.add_argument('--only', help='run endpoints whose name contains this text')
+    parser.add_argument('--baseline', default=os.path.join(ROOT, 'benchmarks', 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='allowed growth factor for latency and memory')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app(make_config(args.database_url))
+    pages = [page for page in endpoints(app) if not args.only or args.only in page[0]]
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, failed = {}, []
+    print(f"{'endpoint':<40} {'p50':>8} {'p95':>8} {'queries':>8} {'peak':>10}")
+    for name, url, user_id in pages:
+        result = results[name] = measure(app, url, user_id, args.iterations, args.warmup, args.cold)
+        problems = regressions(result, baseline[name], args.tolerance) if name in baseline else []
+        if problems:
+            failed.append(name)
+        print(f"{name:<40} {result['p50_ms']:>6.1f}ms {result['p95_ms']:>6.1f}ms "
+              f"{result['queries']:>8} {result['peak_kib']:>7.0f}KiB"
+              + (f"   REGRESSED: {'; '.join(problems)}" if problems else ''))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Saved baseline to {args.baseline}')
+    elif not baseline:
+        print(f'No baseline at {args.baseline}; run with --save-baseline to record one')
+
+    if failed:
+        print(f'{len(failed)} endpoint(s) regressed against the baseline')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""
+Generate a production-sized synthetic dataset for benchmarking
+
+Bulk-inserts users, prayer requests, prayers and encouragements with
+executemany batches into an empty database, then derives everything the
+app stores on the side (request counters, the daily rollup, per-user
+prayer stats) with the same set-based helpers the maintenance commands
+use. Every user shares one precomputed password hash ("password").
+
+The shape follows what we see in production: request popularity is
+Zipf-distributed (a few requests collect most prayers), a small share of
+members do most of the praying, activity peaks in the morning and
+evening, and some days (Sundays, Christmas, random viral days) get
+several times the usual traffic.
+
+    python -m benchmarks.generate_data --users 100000 --requests 20000 --prayers 1000000
+    python -m benchmarks.generate_data --database-url postgresql://localhost/praynoel_bench
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+CATEGORIES = ['Family', 'Health', 'Finances', 'Relationships', 'Grief', 'Gratitude']
+CATEGORY_WEIGHTS = [25, 30, 15, 12, 10, 8]
+
+# Share of activity per hour of day: morning and evening prayer peaks
+HOUR_WEIGHTS = [1, 1, 1, 1, 1, 2, 5, 8, 6, 4, 3, 3, 4, 3, 3, 3, 4, 5, 7, 9, 10, 8, 4, 2]
+
+TITLES = ['Healing for {}', 'Strength for {}', 'Peace for {}', 'Provision for {}',
+          'Comfort for {}', 'Guidance for {}', 'Thanksgiving for {}']
+SUBJECTS = ['my mother', 'my father', 'our family', 'my son', 'my daughter', 'a friend',
+            'my marriage', 'our church', 'my job search', 'my recovery', 'my grandmother']
+SENTENCES = [
+    'Please pray with us this season.',
+    'We have been waiting on test results for weeks.',
+    'The holidays are hard since we lost him.',
+    'God has been faithful through every step so far.',
+    'We need wisdom for a difficult decision.',
+    'Pray for peace and rest in our home.',
+    'Money has been tight and bills keep coming.',
+    'I am grateful for this community and your prayers.',
+]
+VERSES = [None, None, None, 'Philippians 4:6-7', 'Psalm 23:4', 'Isaiah 41:10',
+          'Jeremiah 29:11', 'Romans 8:28', 'Matthew 11:28']
+ENCOURAGEMENTS = ['Praying for you tonight.', 'You are not alone in this.',
+                  'Standing with you in faith.', 'God is near to the brokenhearted.',
+                  'Our small group is lifting you up.']
+
+def make_config(database_url):
+    class GeneratorConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        AUTO_MIGRATE = False
+        PRAYER_SURGE_MODE = 'off'
+    return GeneratorConfig
+
+def day_weights(start, days, rng, spike_rate):
+    """Relative traffic per day: Sundays double, Christmas Eve/Day and random viral days spike."""
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        weight = 1.0
+        if day.weekday() == 6:
+            weight *= 2
+        if (day.month, day.day) in ((12, 24), (12, 25)):
+            weight *= 8
+        if rng.random() < spike_rate:
+            weight *= rng.uniform(3, 6)
+        weights.append(weight)
+    return list(itertools.accumulate(weights))
+
+def at_peak_hour(day, rng):
+    hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+    return datetime(day.year, day.month, day.day, hour, rng.randrange(60), rng.randrange(60))
+
+def zipf_weights(n, exponent, rng):
+    """Cumulative Zipf weights over ids 1..n, ranks shuffled so popularity isn't tied to age."""
+    ranks = list(range(1, n + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** exponent for rank in ranks))
+
+def batched(rows, size):
+    iterator = iter(rows)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.end = datetime.utcnow().replace(microsecond=0)
+        self.start = self.end - timedelta(days=args.days)
+        self.days = day_weights(self.start.date(), args.days, self.rng, args.spike_rate)
+
+    def random_time(self, after=None):
+        """A timestamp on a traffic-weighted day, at a peak-weighted hour, not before `after`."""
+        offset = self.rng.choices(range(len(self.days)), cum_weights=self.days)[0]
+        moment = at_peak_hour(self.start.date() + timedelta(days=offset), self.rng)
+        if after is not None and moment < after:
+            # Most prayers come soon after a request is posted
+            moment = after + timedelta(minutes=self.rng.expovariate(1 / 600))
+        if moment > self.end:
+            moment = after + (self.end - after) * self.rng.random()
+        return moment
+
+    def users(self):
+        password_hash = generate_password_hash('password')
+        for user_id in range(1, self.args.users + 1):
+            yield {
+                'id': user_id,
+                'username': f'member{user_id}',
+                'email': f'member{user_id}@example.com',
+                'password_hash': password_hash,
+                'is_admin': user_id == 1,
+                'created_at': self.start + timedelta(seconds=self.rng.randrange(self.args.days * 86400)),
+            }
+
+    def requests(self):
+        rng = self.rng
+        # A fifth of members ever post, and a few of them post a lot
+        authors = zipf_weights(max(1, self.args.users // 5), 0.8, rng)
+        self.request_times = {}
+        for request_id in range(1, self.args.requests + 1):
+            created_at = self.random_time()
+            answered = rng.random() < 0.08
+            self.request_times[request_id] = created_at
+            yield {
+                'id': request_id,
+                'title': rng.choice(TITLES).format(rng.choice(SUBJECTS)),
+                'content': ' '.join(rng.sample(SENTENCES, rng.randint(2, 5))),
+                'category': rng.choices(CATEGORIES, weights=CATEGORY_WEIGHTS)[0],
+                'bible_verse': rng.choice(VERSES),
+                'is_anonymous': rng.random() < 0.2,
+                'is_private': rng.random() < 0.05,
+                'is_public': rng.random() > 0.01,
+                'is_urgent': rng.random() < 0.1,
+                'is_answered': answered,
+                'testimony': 'God answered in His perfect timing. Thank you for praying!' if answered else None,
+                'user_id': rng.choices(range(1, len(authors) + 1), cum_weights=authors)[0],
+                'created_at': created_at,
+                'updated_at': min(created_at + timedelta(days=rng.randint(1, 30)), self.end) if answered else created_at,
+            }
+
+    def prayers(self):
+        """Distinct (user, request) prayers, shared out across requests by Zipf popularity."""
+        rng, users = self.rng, self.args.users
+        popularity = zipf_weights(self.args.requests, self.args.zipf, rng)
+        total = popularity[-1]
+        # The most active 5% of members offer about half of all prayers
+        intercessors = max(1, users // 20)
+        previous = 0.0
+        for request_id, cumulative in enumerate(popularity, 1):
+            share = self.args.prayers * (cumulative - previous) / total
+            previous = cumulative
+            count = min(users, int(share) + (rng.random() < share % 1))
+            if not count:
+                continue
+            praying = set(rng.sample(range(1, intercessors + 1), min(intercessors, count // 2)))
+            while len(praying) < count:
+                praying.add(rng.randint(1, users))
+            created_at = self.request_times[request_id]
+            for user_id in praying:
+                yield {
+                    'user_id': user_id,
+                    'request_id': request_id,
+                    'prayer_note': rng.choice(ENCOURAGEMENTS) if rng.random() < 0.05 else None,
+                    'is_private': False,
+                    'created_at': self.random_time(after=created_at),
+                }
+
+    def encouragements(self):
+        rng = self.rng
+        popularity = zipf_weights(self.args.requests, self.args.zipf, rng)
+        for _ in range(self.args.encouragements):
+            request_id = rng.choices(range(1, self.args.requests + 1), cum_weights=popularity)[0]
+            yield {
+                'user_id': rng.randint(1, self.args.users),
+                'request_id': request_id,
+                'content': rng.choice(ENCOURAGEMENTS),
+                'bible_verse': rng.choice(VERSES),
+                'created_at': self.random_time(after=self.request_times[request_id]),
+            }
+
+def load(label, model, rows, batch_size):
+    from app.models import db
+
+    started = time.perf_counter()
+    count = 0
+    for batch in batched(rows, batch_size):
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        count += len(batch)
+        print(f'\r  {label}: {count:,}', end='', flush=True)
+    print(f'\r  {label}: {count:,} in {time.perf_counter() - started:.1f}s')
+
+def step(label, work):
+    started = time.perf_counter()
+    work()
+    print(f'  {label} in {time.perf_counter() - started:.1f}s')
+
+def tune_for_reads():
+    from app.models import db
+
+    # The search index is filled by triggers as requests go in; merge its
+    # segments once, and refresh the planner's statistics for the new volume
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text("INSERT INTO prayer_request_fts(prayer_request_fts) VALUES ('optimize')"))
+        db.session.commit()
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('ANALYZE'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL') or
+                        'sqlite:///' + os.path.join(os.path.dirname(os.path.dirname(
+                            os.path.abspath(__file__))), 'benchmark.db'),
+                        help='must point at an empty database (default: benchmark.db)')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--prayers', type=int, default=1000000)
+    parser.add_argument('--encouragements', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90, help='history to spread activity over')
+    parser.add_argument('--zipf', type=float, default=1.1, help='request popularity skew')
+    parser.add_argument('--spike-rate', type=float, default=0.05, help='share of days that go viral')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=2025)
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.counters import reconcile_counters, backfill_daily_counts, backfill_prayer_stats
+    from app.migrations import upgrade
+    from app.models import db, User, PrayerRequest, Prayer, Encouragement
+
+    app = create_app(make_config(args.database_url))
+    with app.app_context():
+        upgrade()
+        if db.session.query(func.count(User.id)).scalar():
+            sys.exit(f'{args.database_url} already has users; point --database-url at an empty database')
+
+        generator = Generator(args)
+        print(f'Generating into {args.database_url}')
+        load('users', User, generator.users(), args.batch_size)
+        load('prayer requests', PrayerRequest, generator.requests(), args.batch_size)
+        load('prayers', Prayer, generator.prayers(), args.batch_size)
+        load('encouragements', Encouragement, generator.encouragements(), args.batch_size)
+
+        print('Deriving stored aggregates')
+        step('request counters', reconcile_counters)
+        step('daily prayer rollup', backfill_daily_counts)
+        step('per-user prayer stats', backfill_prayer_stats)
+        step('search index and planner statistics', tune_for_reads)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Fixed upper bounds on SQL statements per page render
+
+Seeds a throwaway SQLite database where every request card has its own
+author and a pile of prayers and encouragements, then renders each card
+page with every in-process cache cleared and counts the statements it
+runs. The budgets don't depend on how many cards are on the page, so an
+N+1 (one lazy author or prayer lookup per card) blows straight through
+them and the run exits non-zero.
+
+    python -m benchmarks.query_counts
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+# (url, logged in as admin?, most statements allowed)
+BUDGETS = [
+    ('/', False, 6),
+    ('/prayers/feed', False, 4),
+    ('/prayers/feed?sort=most_prayed', False, 4),
+    ('/prayers/feed?sort=most_prayed_week', False, 4),
+    ('/prayers/answered', False, 4),
+    ('/prayers/my-requests', True, 4),
+    ('/admin/dashboard', True, 8),
+]
+
+def build_app(database_path):
+    class QueryCountConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database_path
+        PRAYER_SURGE_MODE = 'off'
+        METRICS_ENABLED = False
+        WTF_CSRF_ENABLED = False
+
+    from app import create_app
+    return create_app(QueryCountConfig)
+
+def seed(app, requests, prayers_per_request):
+    from app.counters import reconcile_counters, backfill_daily_counts
+    from app.models import db, User, PrayerRequest, Prayer, Encouragement
+
+    now = datetime.utcnow()
+    with app.app_context():
+        # One author per request, so lazy author loads can't hide in the identity map
+        db.session.execute(insert(User), [
+            {'username': f'member{i}', 'email': f'member{i}@example.com',
+             'password_hash': 'x', 'is_admin': i == 1}
+            for i in range(1, requests + prayers_per_request + 1)
+        ])
+        db.session.execute(insert(PrayerRequest), [
+            {'title': f'Request {i}', 'content': 'Please pray with us.', 'category': 'Family',
+             'user_id': i, 'is_answered': i % 2 == 0, 'is_anonymous': i % 5 == 0,
+             'created_at': now - timedelta(minutes=i), 'updated_at': now - timedelta(minutes=i)}
+            for i in range(1, requests + 1)
+        ])
+        db.session.execute(insert(Prayer), [
+            {'user_id': requests + j, 'request_id': i, 'created_at': now - timedelta(seconds=j)}
+            for i in range(1, requests + 1) for j in range(1, prayers_per_request + 1)
+        ])
+        db.session.execute(insert(Encouragement), [
+            {'user_id': requests + 1, 'request_id': i, 'content': 'Standing with you.'}
+            for i in range(1, requests + 1)
+        ])
+        # Requests owned by the admin, for My Requests; older than the rest
+        # so the public pages still open on cards with distinct authors
+        db.session.execute(insert(PrayerRequest), [
+            {'title': f'Admin request {i}', 'content': 'Pray for us.', 'category': 'Health',
+             'user_id': 1, 'created_at': now - timedelta(days=30), 'updated_at': now - timedelta(days=30)}
+            for i in range(requests)
+        ])
+        db.session.commit()
+        reconcile_counters()
+        backfill_daily_counts()
+
+def count_statements(app, url, admin):
+    from app.models import db
+    from benchmarks.endpoints import client_for, reset_caches
+
+    client = client_for(app, 1 if admin else None)
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def count(*args):
+        statements.append(args[2])
+
+    reset_caches()
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} answered {response.status_code}')
+    return statements
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=40, help='more than one page of cards')
+    parser.add_argument('--prayers-per-request', type=int, default=25)
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the statements of failing pages')
+    args = parser.parse_args()
+
+    app = build_app(os.path.join(tempfile.mkdtemp(), 'query_counts.db'))
+    seed(app, args.requests, args.prayers_per_request)
+
+    failed = 0
+    for url, admin, budget in BUDGETS:
+        statements = count_statements(app, url, admin)
+        ok = len(statements) <= budget
+        failed += not ok
+        print(f'  [{"ok" if ok else "FAIL"}] {url:<40} {len(statements):>3} statements (budget {budget})')
+        if not ok and args.verbose:
+            for statement in statements:
+                print('        ' + ' '.join(statement.split())[:160])
+
+    if failed:
+        print(f'{failed} page(s) over their statement budget')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
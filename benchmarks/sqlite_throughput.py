@@ -0,0 +1,129 @@
+"""
+Mixed read/write throughput on SQLite across several worker processes
+
+Each worker process stands in for a gunicorn worker: it builds its own
+app against the same database file and, for DURATION seconds, loops over
+feed reads and prayer writes through the Flask test client. The run is
+repeated with the tuned profile (Config.SQLITE_PRAGMAS: WAL,
+synchronous=NORMAL, busy_timeout, ...) and with SQLite's defaults
+(rollback journal, synchronous=FULL, no busy timeout), and reports
+operations per second and failed requests for each.
+
+    python -m benchmarks.sqlite_throughput --workers 4 --duration 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from sqlalchemy import insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+PROFILES = {
+    'tuned': Config.SQLITE_PRAGMAS,
+    'default': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 0},
+}
+
+USERS = 2000
+REQUESTS = 200
+
+def make_config(database_path, pragmas):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database_path
+        SQLITE_PRAGMAS = pragmas
+        PRAYER_SURGE_MODE = 'off'
+        AUTO_MIGRATE = False
+    return BenchConfig
+
+def prepare(database_path, pragmas):
+    from app import create_app
+    from app.migrations import upgrade
+    from app.models import db, User, PrayerRequest
+
+    app = create_app(make_config(database_path, pragmas))
+    with app.app_context():
+        upgrade()
+        db.session.execute(insert(User), [
+            {'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password_hash': 'x'}
+            for i in range(USERS)
+        ])
+        db.session.execute(insert(PrayerRequest), [
+            {'title': f'Benchmark request {i}', 'content': 'Please pray for our family this season',
+             'category': random.choice(['Family', 'Health', 'Grief']), 'user_id': 1 + i % USERS}
+            for i in range(REQUESTS)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+def worker(worker_id, workers, database_path, pragmas, duration, write_ratio, results):
+    from app import create_app
+
+    app = create_app(make_config(database_path, pragmas))
+    rng = random.Random(worker_id)
+    # Each worker prays as its own slice of users so writes never collide on
+    # the one-prayer-per-user rule and every write is a real insert
+    users = [u for u in range(1, USERS + 1) if u % workers == worker_id]
+    pairs = [(u, r) for u in users for r in range(1, REQUESTS + 1)]
+    rng.shuffle(pairs)
+
+    reads = writes = errors = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        client = app.test_client()
+        if rng.random() < write_ratio and pairs:
+            user_id, request_id = pairs.pop()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+            status = client.post(f'/prayers/pray/{request_id}').status_code
+            ok, writes = status == 302, writes + 1
+        else:
+            ok, reads = client.get('/prayers/feed?sort=most_prayed').status_code == 200, reads + 1
+        errors += not ok
+
+    results.put((reads, writes, errors))
+
+def run(profile, workers, duration, write_ratio):
+    pragmas = PROFILES[profile]
+    database_path = os.path.join(tempfile.mkdtemp(), f'{profile}.db')
+    prepare(database_path, pragmas)
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(i, workers, database_path, pragmas,
+                                                     duration, write_ratio, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    reads = sum(t[0] for t in totals)
+    writes = sum(t[1] for t in totals)
+    errors = sum(t[2] for t in totals)
+    print(f'{profile:>8}: {(reads + writes - errors) / duration:8,.0f} successful ops/s '
+          f'({reads / duration:,.0f} reads/s, {writes / duration:,.0f} writes/s attempted), '
+          f'{errors} failed requests')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per profile')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--profile', choices=['both'] + list(PROFILES), default='both')
+    args = parser.parse_args()
+
+    profiles = list(PROFILES) if args.profile == 'both' else [args.profile]
+    print(f'{args.workers} worker processes, {args.write_ratio:.0%} writes, {args.duration:g}s each')
+    for profile in profiles:
+        run(profile, args.workers, args.duration, args.write_ratio)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Hammer the PrayerStats daily counter from many threads at once
+
+Every thread records prayers for the same user on the same day, each in
+its own session and transaction, and the run fails if the stored total
+differs from the number of committed increments or more than one row
+exists for the user/day.
+
+    python -m benchmarks.stats_concurrency --threads 16 --increments 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import db, User, PrayerStats
+from app.counters import record_prayer_stats
+from config import Config
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--increments', type=int, default=200, help='per thread')
+    parser.add_argument('--database-url', help='defaults to a throwaway SQLite file')
+    args = parser.parse_args()
+
+    class RaceConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database_url or \
+            'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stats.db')
+
+    app = create_app(RaceConfig)
+    with app.app_context():
+        user = User(username='stats-race', email='stats-race@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    start = threading.Barrier(args.threads)
+    committed = []
+
+    def work():
+        start.wait()
+        done = 0
+        for _ in range(args.increments):
+            with app.app_context():
+                try:
+                    record_prayer_stats(user_id)
+                    db.session.commit()
+                    done += 1
+                except Exception as e:
+                    db.session.rollback()
+                    print(f'increment failed: {e}', file=sys.stderr)
+        committed.append(done)
+
+    threads = [threading.Thread(target=work) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        rows = PrayerStats.query.filter_by(user_id=user_id).all()
+        stored = sum(row.prayers_offered for row in rows)
+
+    expected = sum(committed)
+    print(f'committed={expected} stored={stored} rows={len(rows)}')
+    if stored != expected or len(rows) != 1:
+        print('FAIL: lost updates or duplicate rows')
+        sys.exit(1)
+    print('ok: no lost updates')
+
+if __name__ == '__main__':
+    main()
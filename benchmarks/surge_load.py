@@ -0,0 +1,120 @@
+"""
+Replay a Christmas Eve prayer surge against the pray route
+
+Builds a throwaway SQLite database with USERS users and a handful of
+requests, then fires CLICKS pray clicks (a share of them repeats) from a
+thread pool through the Flask test client. Afterwards it checks that
+every distinct (user, request) pair was recorded exactly once and that
+the stored counters agree with the Prayer rows.
+
+    python -m benchmarks.surge_load --clicks 10000 --mode on
+    python -m benchmarks.surge_load --clicks 10000 --mode off
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models import db, User, PrayerRequest, Prayer, PrayerStats
+from app.surge import prayer_buffer
+from config import Config
+
+def build_app(database_path, mode):
+    class SurgeConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + database_path
+        PRAYER_SURGE_MODE = mode
+        WTF_CSRF_ENABLED = False
+
+    return create_app(SurgeConfig)
+
+def seed(app, users, requests):
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'username': f'surge{i}', 'email': f'surge{i}@example.com', 'password_hash': 'x'}
+            for i in range(users)
+        ])
+        db.session.execute(insert(PrayerRequest), [
+            {'title': f'Surge request {i}', 'content': 'Praying together on Christmas Eve',
+             'category': 'Family', 'user_id': 1}
+            for i in range(requests)
+        ])
+        db.session.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clicks', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=4000)
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--repeat-rate', type=float, default=0.2,
+                        help='share of clicks that repeat an earlier click')
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--mode', choices=['on', 'off'], default='on')
+    args = parser.parse_args()
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'surge.db')
+    app = build_app(database_path, args.mode)
+    seed(app, args.users, args.requests)
+
+    random.seed(2025)
+    clicks = []
+    for _ in range(args.clicks):
+        if clicks and random.random() < args.repeat_rate:
+            clicks.append(random.choice(clicks))
+        else:
+            clicks.append((random.randint(1, args.users), random.randint(1, args.requests)))
+
+    def click(pair):
+        user_id, request_id = pair
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        started = time.perf_counter()
+        response = client.post(f'/prayers/pray/{request_id}')
+        return response.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(click, clicks))
+    elapsed = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    while prayer_buffer.flush():
+        pass
+    flush_elapsed = time.perf_counter() - flush_started
+
+    latencies = sorted(latency for _, latency in results)
+    failures = sum(1 for status, _ in results if status != 302)
+    print(f'mode={args.mode} clicks={len(clicks)} distinct={len(set(clicks))} failures={failures}')
+    print(f'throughput: {len(clicks) / elapsed:,.0f} clicks/s over {elapsed:.2f}s '
+          f'(+{flush_elapsed:.2f}s final flush)')
+    print(f'latency: p50={latencies[len(latencies) // 2] * 1000:.1f}ms '
+          f'p95={latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms')
+
+    with app.app_context():
+        prayers = Prayer.query.count()
+        distinct_rows = db.session.query(Prayer.user_id, Prayer.request_id).distinct().count()
+        stored = db.session.query(func.sum(PrayerRequest.prayer_count)).scalar()
+        offered = db.session.query(func.sum(PrayerStats.prayers_offered)).scalar()
+
+    checks = {
+        'every distinct click recorded': prayers == len(set(clicks)),
+        'no duplicate prayers': distinct_rows == prayers,
+        'prayer_count matches rows': stored == prayers,
+        'prayer stats match rows': offered == prayers,
+        'no failed requests': failures == 0,
+    }
+    for name, ok in checks.items():
+        print(f'  [{"ok" if ok else "FAIL"}] {name}')
+    sys.exit(0 if all(checks.values()) else 1)
+
+if __name__ == '__main__':
+    main()
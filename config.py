@@ -10,8 +10,84 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'pray_noel.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool. Pool sizing is dropped automatically for in-memory SQLite.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True
+    }
+    
+    # PRAGMAs run on every new SQLite connection. WAL lets readers carry on
+    # while one writer commits, so gunicorn workers stop serializing on the
+    # rollback journal; busy_timeout makes writers wait instead of failing
+    # with "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,  # ms
+        'cache_size': -64000,  # negative = KiB, so 64 MB
+        'mmap_size': 268435456,  # 256 MB
+        'temp_store': 'MEMORY'
+    }
+    
+    # Apply pending schema migrations on startup. Multi-worker deployments
+    # can turn this off and run `flask upgrade-db` once per deploy instead.
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
+    
+    # Per-request SQL profiling (statement counts, DB time, slowest
+    # statements, N+1 detection), reported at /admin/perf and in the log
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', '0') == '1'
+    SQL_PROFILING_SLOWEST = 5  # statements kept per request and per endpoint
+    SQL_PROFILING_WINDOW = 500  # recent requests per endpoint behind the percentiles
+    SQL_N_PLUS_ONE_THRESHOLD = 5  # same statement shape more often than this is flagged
+    
+    # Prometheus metrics at /metrics. Each worker writes its numbers to
+    # METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds and the scrape
+    # sums all workers. Unset, each process reports only its own numbers.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 1.0
+    
     # Christmas Eve Global Prayer
     CHRISTMAS_EVE_PRAYER_TIME = '2025-12-24 20:00:00'
     
+    # Surge mode buffers prayer clicks in memory and writes them in batches.
+    # 'auto' turns it on within PRAYER_SURGE_WINDOW_MINUTES of the prayer time.
+    PRAYER_SURGE_MODE = os.environ.get('PRAYER_SURGE_MODE', 'auto')  # auto, on, off
+    PRAYER_SURGE_WINDOW_MINUTES = 60
+    PRAYER_SURGE_FLUSH_INTERVAL = 0.5  # seconds between batch writes
+    PRAYER_SURGE_BATCH_SIZE = 500  # flush early once this many clicks are queued
+    
+    # Most requests one batch "pray" call may cover
+    PRAY_BATCH_MAX = 100
+    
+    # Live counts (/live/counts): one aggregation per tick per worker,
+    # shared by every open stream
+    LIVE_TICK_SECONDS = 2
+    LIVE_HEARTBEAT_SECONDS = 15
+    
     # Pagination
     REQUESTS_PER_PAGE = 20
+    ADMIN_USERS_PER_PAGE = 50
+    ADMIN_REPORTS_PER_PAGE = 20
+    API_MAX_PER_PAGE = 100  # largest ?limit= the JSON API accepts
+    
+    # Logged-in user snapshots cached per worker process
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60  # seconds
+    
+    # Seconds the cached community statistics may be served before recomputing
+    COMMUNITY_STATS_TTL = 60
+    
+    # Seconds each worker serves its in-memory Advent calendar before checking
+    # the database for re-seeded reflections
+    ADVENT_RELOAD_SECONDS = 300
+    
+    # Seconds browsers and proxies may reuse a public page for anonymous
+    # visitors before revalidating it with its ETag
+    PUBLIC_CACHE_MAX_AGE = 30
+    
+    # Rendered prayer request cards kept per worker process (LRU)
+    CARD_CACHE_SIZE = 2048
@@ -5,6 +5,8 @@ Run this after creating the database to add initial content
 
 from app import create_app
 from app.models import db, User, PrayerRequest, Prayer, Encouragement, AdventReflection
+from app.counters import reconcile_counters, backfill_daily_counts, backfill_prayer_stats
+from app.migrations import upgrade
 from datetime import datetime
 
 def seed_database():
@@ -14,7 +16,7 @@ def seed_database():
         # Clear existing data (optional - comment out if you want to keep existing data)
         print("Clearing existing data...")
         db.drop_all()
-        db.create_all()
+        upgrade()
         
         # Create sample users
         print("Creating users...")
@@ -188,6 +190,11 @@ def seed_database():
         db.session.commit()
         print(f"Created {len(encouragements_data)} encouragements")
         
+        # Prayers and encouragements were inserted directly, so sync the counters
+        reconcile_counters()
+        backfill_daily_counts()
+        backfill_prayer_stats()
+        
         # Create Advent Reflections (sample for first few days)
         print("Creating advent reflections...")
         advent_data = [